@@ -0,0 +1,62 @@
+import base64
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import text
+
+
+def encode_cursor(created_at, comment_id):
+    """Opaque cursor for the comment after which the next page starts."""
+    raw = f"{created_at.isoformat()}|{comment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(created_at, comment_id) from `encode_cursor`; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, comment_id = raw.split("|")
+        return datetime.fromisoformat(created_at), str(uuid.UUID(comment_id))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def bump_comments_version(db, video_id):
+    """Mark cached comment pages for `video_id` stale in every API worker. Runs in the caller's transaction."""
+    db.execute(
+        text("UPDATE videos SET comments_version = comments_version + 1 WHERE video_id = :video_id"),
+        {"video_id": video_id}
+    )
+
+
+class CommentPageCache:
+    """
+    In-memory LRU of the first page of comments per video.
+
+    Entries are tagged with the video's comments_version when they were
+    read, and a lookup only hits if the version still matches. Anything
+    that adds or moderates a comment bumps that version, including the
+    moderation worker in another process, so a stale page is never served.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_id, version):
+        with self._lock:
+            entry = self._pages.get(video_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._pages.move_to_end(video_id)
+            return entry[1]
+
+    def put(self, video_id, version, page):
+        with self._lock:
+            self._pages[video_id] = (version, page)
+            self._pages.move_to_end(video_id)
+            while len(self._pages) > self.capacity:
+                self._pages.popitem(last=False)
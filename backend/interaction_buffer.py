@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+from ids import uuid7
+
+
+class InteractionBuffer:
+    """
+    Write-behind buffer for user_video_interactions.
+
+    `record` appends the event to a local log segment and returns; a
+    background thread inserts pending events in multi-row INSERTs every
+    `flush_interval` seconds or as soon as `max_batch` are waiting. The
+    same thread fsyncs the open segment every `sync_interval` seconds, so
+    one disk sync covers every event written since the last, and a segment
+    is deleted only after its events are committed. A process crash loses
+    nothing; a machine crash loses at most `sync_interval` of events. Segments left behind by a crashed process, or
+    by a flush that failed, are replayed by whichever worker claims them
+    first, at startup and every `stale_after` seconds. Interaction IDs
+    are generated up front and inserted with INSERT IGNORE, which makes
+    replaying an already-committed segment harmless.
+
+    With `counters` given, each batch also adds its views to the videos'
+    view_count in the same transaction, one UPDATE per video rather than
+    per view. Replaying a segment whose batch had already committed counts
+    its views twice; constant_run.py's nightly reconcile corrects that.
+    """
+
+    def __init__(self, engine, log_dir, max_batch=500, flush_interval=0.2, sync_interval=0.05, stale_after=30, counters=None):
+        self.engine = engine
+        self.counters = counters
+        self.log_dir = Path(log_dir)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        # Segments untouched this long belong to a process that is gone
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pending = []
+        self._segment = None
+        self._segment_path = None
+        self._unsynced = False
+        self._sequence = 0
+        self._failed = []
+        self.flushed = 0
+
+    def _open_segment(self):
+        self._sequence += 1
+        self._segment_path = self.log_dir / f"interactions-{os.getpid()}-{int(time.time() * 1000)}-{self._sequence}.log"
+        self._segment = open(self._segment_path, "a", encoding="utf-8")
+
+    def record(self, user_id, video_id, interaction_type):
+        event = {
+            "interaction_id": str(uuid7()),
+            "user_id": user_id,
+            "video_id": video_id,
+            "interaction_type": interaction_type,
+            "interaction_timestamp": datetime.now().isoformat(sep=" ")
+        }
+        with self._lock:
+            # Segments are opened lazily, so an idle process never holds one open
+            if self._segment is None:
+                self._open_segment()
+            self._segment.write(json.dumps(event) + "\n")
+            # Hands the line to the OS, which keeps it if this process dies; _sync makes it durable
+            self._segment.flush()
+            self._unsynced = True
+            self._pending.append(event)
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+        return event["interaction_id"]
+
+    def _insert(self, events):
+        for start in range(0, len(events), self.max_batch):
+            batch = events[start:start + self.max_batch]
+            params = {}
+            rows = []
+            for i, event in enumerate(batch):
+                rows.append(f"(UUID_TO_BIN(:id_{i}), :user_{i}, :video_{i}, :type_{i}, :ts_{i})")
+                params.update({
+                    f"id_{i}": event["interaction_id"],
+                    f"user_{i}": event["user_id"],
+                    f"video_{i}": event["video_id"],
+                    f"type_{i}": event["interaction_type"],
+                    f"ts_{i}": event["interaction_timestamp"]
+                })
+            # IGNORE skips rows already written by an earlier attempt
+            query = f"""
+                INSERT IGNORE INTO user_video_interactions
+                    (interaction_id, user_id, video_id, interaction_type, interaction_timestamp)
+                VALUES {", ".join(rows)}
+            """
+            with self.engine.begin() as conn:
+                conn.execute(text(query), params)
+                if self.counters is not None:
+                    views = Counter(event["video_id"] for event in batch if event["interaction_type"] == "view")
+                    for video_id, count in views.items():
+                        self.counters.increment(conn, video_id, 'views', count)
+
+    def _sync(self):
+        # Only the flush thread closes segments, so the file stays open while it syncs outside the lock
+        with self._lock:
+            if not self._unsynced:
+                return
+            self._unsynced = False
+            segment = self._segment
+        os.fsync(segment.fileno())
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return 0
+            events, self._pending = self._pending, []
+            sealed = self._segment_path
+            self._segment.close()
+            self._segment = None
+            self._segment_path = None
+            self._unsynced = False
+
+        try:
+            self._insert(events)
+            sealed.unlink()
+            self.flushed += len(events)
+            return len(events)
+        except Exception as e:
+            print(f"[{datetime.now()}] Interaction flush of {len(events)} events failed, will retry from {sealed.name}: {e}")
+            # The segment now has to outlast the outage, so sync whatever the last interval didn't
+            with open(sealed, "rb") as f:
+                os.fsync(f.fileno())
+            self._failed.append(sealed)
+            return 0
+
+    def _replay_segment(self, path):
+        events = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+        if events:
+            self._insert(events)
+        path.unlink(missing_ok=True)
+        return len(events)
+
+    def _claim(self, path):
+        """
+        Take ownership of a segment by renaming it, so two workers sharing
+        `log_dir` never replay the same one. Returns the claimed path, or
+        None if another worker got there first.
+        """
+        claimed = path.with_name(f"{path.name.split('.log')[0]}.log.claimed-{os.getpid()}")
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return None
+        # A claim left by a worker that died mid-replay becomes stale again after stale_after
+        os.utime(claimed)
+        return claimed
+
+    def replay(self):
+        """Insert events from segments left by a crashed process or an abandoned claim."""
+        replayed = 0
+        now = time.time()
+        for path in sorted(self.log_dir.glob("interactions-*.log*")):
+            try:
+                if path == self._segment_path or path in self._failed or now - path.stat().st_mtime < self.stale_after:
+                    continue
+            except FileNotFoundError:
+                continue
+            claimed = self._claim(path)
+            if claimed is None:
+                continue
+            try:
+                replayed += self._replay_segment(claimed)
+            except Exception as e:
+                print(f"[{datetime.now()}] Could not replay {path.name}, will retry: {e}")
+                self._failed.append(claimed)
+        if replayed:
+            print(f"[{datetime.now()}] Replayed {replayed} buffered interactions")
+        return replayed
+
+    def _retry_failed(self):
+        failed, self._failed = self._failed, []
+        for path in failed:
+            claimed = self._claim(path)
+            if claimed is None:
+                # Another worker claimed it after it went stale
+                continue
+            try:
+                self._replay_segment(claimed)
+            except Exception as e:
+                print(f"[{datetime.now()}] Retry of {path.name} failed: {e}")
+                self._failed.append(claimed)
+
+    def _run(self):
+        last_flush = last_replay = time.monotonic()
+        while not self._stopping.is_set():
+            woken = self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            if not woken and time.monotonic() - last_flush < self.flush_interval:
+                self._sync()
+                continue
+            # A flush deletes the segment on success and syncs it on failure, so it needs no sync first
+            last_flush = time.monotonic()
+            self.flush()
+            if self._failed:
+                self._retry_failed()
+            # Picks up segments from a process that crashed and was restarted within stale_after
+            if time.monotonic() - last_replay >= self.stale_after:
+                last_replay = time.monotonic()
+                self.replay()
+
+    def start(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.replay()
+        self._thread = threading.Thread(target=self._run, name="interaction-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+        if self._failed:
+            self._retry_failed()
@@ -2,8 +2,9 @@ from fastapi import FastAPI, HTTPException, Depends, status, Response, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func, and_
+from sqlalchemy import text
 from datetime import datetime, timedelta
 from typing import Optional
 import os
@@ -29,7 +30,7 @@ frontend_port = int(os.getenv("FRONTEND_PORT", "5175"))
 print(f"Backend starting on port: {backend_port}")
 print(f"Frontend expected on port: {frontend_port}")
 
-from models import Base, User, Like, Video, UserVideoInteraction, Comment
+from models import User, Like, Video, Comment
 from database import SessionLocal, engine
 from schemas import UserCreate, UserOut, Token, CommentCreate
 from auth import (
@@ -42,12 +43,22 @@ from auth import (
 )
 from recommend_videos import (
     recommend_videos,
+    random_unseen_videos,
     get_user_preferences,
     get_user_viewed_videos,
-    load_video_data_from_mysql
+    load_video_data_from_mysql,
+    load_recommendation_model
 )
-
-Base.metadata.create_all(bind=engine)
+from seen_videos import SeenVideosCache
+from interaction_buffer import InteractionBuffer
+from video_counters import VideoCounters
+from ids import uuid7
+from comment_pages import CommentPageCache, encode_cursor, decode_cursor, bump_comments_version
+from queries import VIDEO_EXISTS_QUERY, COMMENTS_VERSION_QUERY, COMMENT_PAGE_QUERY, COMMENT_PAGE_AFTER
+from moderation_events import publish_pending, moderate_comment_inline
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 
 app = FastAPI()
 
@@ -61,6 +72,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+seen_videos = SeenVideosCache(get_user_viewed_videos)
+
+video_counters = VideoCounters(
+    shards=int(os.getenv("VIDEO_COUNTER_SHARDS", "0")),
+    hot_threshold=int(os.getenv("HOT_VIDEO_UPDATES_PER_SECOND", "20"))
+)
+
+VIDEO_BATCH_MAX = 50
+
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "20"))
+COMMENT_PAGE_MAX = 100
+
+comment_pages = CommentPageCache(capacity=int(os.getenv("COMMENT_PAGE_CACHE_VIDEOS", "10000")))
+
+interaction_buffer = InteractionBuffer(
+    engine,
+    log_dir=os.getenv("INTERACTION_LOG_DIR", str(Path(__file__).parent / "interaction_log")),
+    max_batch=int(os.getenv("INTERACTION_FLUSH_EVENTS", "500")),
+    flush_interval=int(os.getenv("INTERACTION_FLUSH_MS", "200")) / 1000,
+    sync_interval=int(os.getenv("INTERACTION_SYNC_MS", "50")) / 1000,
+    counters=video_counters
+)
+
+@app.on_event("startup")
+def check_schema_revision():
+    # The schema is owned by the migrations in backend/migrations; the API never creates tables itself
+    try:
+        config = AlembicConfig(str(Path(__file__).parent / "alembic.ini"))
+        head = ScriptDirectory.from_config(config).get_current_head()
+        with engine.connect() as connection:
+            current = MigrationContext.configure(connection).get_current_revision()
+        if current != head:
+            print(f"Database schema is at revision {current}, code expects {head}; run `alembic upgrade head` in backend/")
+    except Exception as e:
+        print(f"Could not check database schema revision: {e}")
+
+@app.on_event("startup")
+def start_interaction_buffer():
+    interaction_buffer.start()
+
+@app.on_event("shutdown")
+def stop_interaction_buffer():
+    interaction_buffer.stop()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -68,6 +123,55 @@ def get_db():
     finally:
         db.close()
 
+def video_cards(db, video_ids, user_id):
+    """
+    Feed card payloads for `video_ids`, keyed by video ID: metadata, current
+    counts, author and whether `user_id` has liked the video. Three queries
+    however many videos are asked for; IDs that don't exist are left out.
+    """
+    video_ids = list(dict.fromkeys(str(video_id) for video_id in video_ids))
+    if not video_ids:
+        return {}
+
+    rows = db.query(
+        Video.video_id,
+        Video.user_id,
+        Video.title,
+        Video.category,
+        User.username,
+        User.profile_picture_url
+    ).outerjoin(
+        User, User.user_id == Video.user_id
+    ).filter(
+        Video.video_id.in_(video_ids)
+    ).all()
+    counts = video_counters.read(db, video_ids)
+    liked = {
+        like.video_id for like in db.query(Like.video_id).filter(
+            Like.user_id == user_id,
+            Like.video_id.in_(video_ids)
+        )
+    }
+
+    cards = {}
+    for row in rows:
+        video_counts = counts.get(row.video_id, {"likes": 0, "comments": 0, "views": 0})
+        cards[row.video_id] = {
+            "video_id": row.video_id,
+            "user_id": row.user_id,
+            "title": row.title,
+            "category": row.category,
+            "likes": video_counts["likes"],
+            "comments": video_counts["comments"],
+            "views": video_counts["views"],
+            "liked": row.video_id in liked,
+            "user": {
+                "username": row.username or "Unknown User",
+                "profile_picture_url": row.profile_picture_url or "/default-avatar.png"
+            }
+        }
+    return cards
+
 @app.post("/auth/register", response_model=UserOut)
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = db.query(User).filter(User.email == user.email).first()
@@ -213,52 +317,55 @@ async def get_video_recommendations(
         else:
             categories = get_user_preferences(current_user.user_id)
         
-        viewed_videos = get_user_viewed_videos(current_user.user_id)
-        if video_id:
-            viewed_videos = [v for v in viewed_videos if v != video_id]
-        
-        recommended_videos = recommend_videos(
-            categories=categories,
-            viewed_video_ids=viewed_videos,
-            top_n=8
-        )
-        
-        all_videos = load_video_data_from_mysql()
-        if all_videos is not None:
+        model_data = load_recommendation_model()
+        if model_data is not None and 'category_index' in model_data:
+            # Exclusion is one mask over the model's videos, however long the user's history is
+            seen_mask = seen_videos.mask(current_user.user_id, model_data, allow=video_id)
+            recommended_videos = recommend_videos(
+                categories=categories,
+                top_n=8,
+                model_data=model_data,
+                seen_mask=seen_mask
+            )
             try:
-                available_videos = all_videos[
-                    ~all_videos['video_id'].isin(viewed_videos) &
-                    ~all_videos['video_id'].isin([v['video_id'] for v in recommended_videos])
-                ]
-                if not available_videos.empty:
-                    random_videos = available_videos.sample(n=min(2, len(available_videos)))
-                    random_videos_list = random_videos[['video_id', 'user_id', 'title', 'category', 'likes', 'comments', 'views']].to_dict(orient='records')
-                    recommended_videos.extend(random_videos_list)
+                recommended_videos.extend(random_unseen_videos(
+                    model_data,
+                    seen_mask,
+                    exclude_ids=[v['video_id'] for v in recommended_videos]
+                ))
             except Exception as e:
                 print(f"Error getting random videos: {e}")
-
-        for video in recommended_videos:
-            like_count = db.query(Like).filter(Like.video_id == video['video_id']).count()
-            video['likes'] = like_count
-
-            comment_count = db.query(Comment).filter(
-                Comment.video_id == video['video_id'],
-                Comment.is_active == True,
-                Comment.moderation_status == 'approved'
-            ).count()
-            video['comments'] = comment_count
-
-            user = db.query(User).filter(User.user_id == video['user_id']).first()
-            if user:
-                video['user'] = {
-                    'username': user.username,
-                    'profile_picture_url': user.profile_picture_url or '/default-avatar.png'
-                }
-            else:
-                video['user'] = {
-                    'username': 'Unknown User',
-                    'profile_picture_url': '/default-avatar.png'
-                }
+        else:
+            viewed_videos = get_user_viewed_videos(current_user.user_id)
+            if video_id:
+                viewed_videos = [v for v in viewed_videos if v != video_id]
+            
+            recommended_videos = recommend_videos(
+                categories=categories,
+                viewed_video_ids=viewed_videos,
+                top_n=8
+            )
+            
+            all_videos = load_video_data_from_mysql()
+            if all_videos is not None:
+                try:
+                    available_videos = all_videos[
+                        ~all_videos['video_id'].isin(viewed_videos) &
+                        ~all_videos['video_id'].isin([v['video_id'] for v in recommended_videos])
+                    ]
+                    if not available_videos.empty:
+                        random_videos = available_videos.sample(n=min(2, len(available_videos)))
+                        random_videos_list = random_videos[['video_id', 'user_id', 'title', 'category', 'likes', 'comments', 'views']].to_dict(orient='records')
+                        recommended_videos.extend(random_videos_list)
+                except Exception as e:
+                    print(f"Error getting random videos: {e}")
+
+        # The model's metadata and counts are as of its last update; the cards are current
+        cards = video_cards(db, [video['video_id'] for video in recommended_videos], current_user.user_id)
+        recommended_videos = [
+            cards[str(video['video_id'])] for video in recommended_videos
+            if str(video['video_id']) in cards
+        ]
 
         return recommended_videos or []
         
@@ -269,6 +376,28 @@ async def get_video_recommendations(
             detail=f"Error getting video recommendations: {str(e)}"
         )
 
+@app.get("/videos/batch")
+async def get_videos_batch(
+    ids: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    video_ids = [video_id for video_id in dict.fromkeys(ids.split(",")) if video_id]
+    if len(video_ids) > VIDEO_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {VIDEO_BATCH_MAX} videos per request"
+        )
+
+    try:
+        cards = video_cards(db, video_ids, current_user.user_id)
+        return [cards[video_id] for video_id in video_ids if video_id in cards]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 @app.get("/videos/{video_id}/stream")
 async def stream_video(
     video_id: str,
@@ -385,8 +514,11 @@ async def like_video(
     db: Session = Depends(get_db)
 ):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not video:
+        exists = db.execute(
+            text(VIDEO_EXISTS_QUERY),
+            {"video_id": video_id}
+        ).first()
+        if not exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
@@ -404,23 +536,14 @@ async def like_video(
             )
         
         new_like = Like(
-            like_id=str(uuid.uuid4()),
+            like_id=str(uuid7()),
             user_id=current_user.user_id,
             video_id=video_id
         )
         db.add(new_like)
-        
-        video.like_count = video.like_count + 1
-        
-        interaction = UserVideoInteraction(
-            interaction_id=str(uuid.uuid4()),
-            user_id=current_user.user_id,
-            video_id=video_id,
-            interaction_type='like'
-        )
-        db.add(interaction)
-        
+        video_counters.increment(db, video_id, 'likes')
         db.commit()
+        interaction_buffer.record(current_user.user_id, video_id, 'like')
         return {"success": True}
     except HTTPException:
         raise
@@ -438,8 +561,11 @@ async def unlike_video(
     db: Session = Depends(get_db)
 ):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not video:
+        exists = db.execute(
+            text(VIDEO_EXISTS_QUERY),
+            {"video_id": video_id}
+        ).first()
+        if not exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
@@ -457,9 +583,7 @@ async def unlike_video(
             )
         
         db.delete(like)
-        
-        video.like_count = max(0, video.like_count - 1)
-        
+        video_counters.increment(db, video_id, 'likes', -1)
         db.commit()
         return {"success": True}
     except HTTPException:
@@ -474,33 +598,42 @@ async def unlike_video(
 @app.get("/videos/{video_id}/comments")
 async def get_video_comments(
     video_id: str,
+    cursor: Optional[str] = None,
+    limit: int = COMMENT_PAGE_SIZE,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    limit = max(1, min(limit, COMMENT_PAGE_MAX))
+    params = {"video_id": video_id, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        try:
+            params["created_at"], params["comment_id"] = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        keyset = COMMENT_PAGE_AFTER
+
     try:
-        query = """
-            SELECT 
-                c.comment_id,
-                c.video_id,
-                c.user_id,
-                c.content,
-                c.created_at,
-                c.like_count,
-                c.moderation_status,
-                u.username,
-                u.profile_picture_url
-            FROM comments c
-            JOIN users u ON c.user_id = u.user_id
-            WHERE c.video_id = :video_id
-                AND c.is_active = true
-                AND (c.moderation_status = 'approved' OR c.moderation_status = 'pending')
-            ORDER BY c.created_at DESC
-        """
-        
-        result = db.execute(text(query), {"video_id": video_id})
+        # Only the default-sized first page is cached; it's what every viewer opening the panel asks for
+        cacheable = cursor is None and limit == COMMENT_PAGE_SIZE
+        if cacheable:
+            version = db.execute(
+                text(COMMENTS_VERSION_QUERY),
+                {"video_id": video_id}
+            ).scalar()
+            if version is None:
+                return {"comments": [], "next_cursor": None}
+            cached = comment_pages.get(video_id, version)
+            if cached is not None:
+                return cached
+
+        rows = db.execute(text(COMMENT_PAGE_QUERY.format(keyset=keyset)), params).fetchall()
         comments = []
         
-        for row in result:
+        for row in rows[:limit]:
             comments.append({
                 "comment_id": row.comment_id,
                 "video_id": row.video_id,
@@ -515,7 +648,16 @@ async def get_video_comments(
                 }
             })
         
-        return comments
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.created_at, last.comment_id)
+        
+        page = {"comments": comments, "next_cursor": next_cursor}
+        if cacheable:
+            # Tagged with the version read before the query, so a concurrent change leaves it stale rather than wrong
+            comment_pages.put(video_id, version, page)
+        return page
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -530,15 +672,18 @@ async def create_comment(
     db: Session = Depends(get_db)
 ):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not video:
+        exists = db.execute(
+            text(VIDEO_EXISTS_QUERY),
+            {"video_id": video_id}
+        ).first()
+        if not exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
             )
         
         new_comment = Comment(
-            comment_id=str(uuid.uuid4()),
+            comment_id=str(uuid7()),
             video_id=video_id,
             user_id=current_user.user_id,
             content=comment.content,
@@ -546,20 +691,26 @@ async def create_comment(
             is_active=True,
             moderation_status='pending'
         )
-        db.add(new_comment)
-        
-        video.comment_count = video.comment_count + 1
         
-        interaction = UserVideoInteraction(
-            interaction_id=str(uuid.uuid4()),
-            user_id=current_user.user_id,
-            video_id=video_id,
-            interaction_type='comment'
-        )
-        db.add(interaction)
+        # Try for an inline verdict; on timeout the comment stays pending for the background worker
+        verdict = await run_in_threadpool(moderate_comment_inline, comment.content)
+        if verdict:
+            new_comment.moderation_status = verdict['status']
+            new_comment.moderation_labels = json.loads(verdict['labels'])
+            new_comment.moderation_score = verdict['score']
+            new_comment.moderation_reason = verdict['reason']
         
+        db.add(new_comment)
+        # comment_count covers approved comments only; pending ones are counted when moderation approves them
+        if new_comment.moderation_status == 'approved':
+            video_counters.increment(db, video_id, 'comments')
+        bump_comments_version(db, video_id)
         db.commit()
         db.refresh(new_comment)
+        interaction_buffer.record(current_user.user_id, video_id, 'comment')
+        
+        if new_comment.moderation_status == 'pending':
+            publish_pending('comment', new_comment.comment_id)
         
         return {
             "comment_id": new_comment.comment_id,
@@ -568,6 +719,7 @@ async def create_comment(
             "content": new_comment.content,
             "created_at": new_comment.created_at.isoformat(),
             "like_count": 0,
+            "moderation_status": new_comment.moderation_status,
             "user": {
                 "username": current_user.username,
                 "profile_picture_url": current_user.profile_picture_url or "/default-avatar.png"
@@ -589,39 +741,14 @@ async def get_video(
     db: Session = Depends(get_db)
 ):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
+        video = video_cards(db, [video_id], current_user.user_id).get(video_id)
         if not video:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
             )
 
-        like_count = db.query(Like).filter(Like.video_id == video_id).count()
-        comment_count = db.query(Comment).filter(
-            Comment.video_id == video_id,
-            Comment.is_active == True,
-            Comment.moderation_status == 'approved'
-        ).count()
-        view_count = db.query(UserVideoInteraction).filter(
-            UserVideoInteraction.video_id == video_id,
-            UserVideoInteraction.interaction_type == 'view'
-        ).count()
-
-        user = db.query(User).filter(User.user_id == video.user_id).first()
-
-        return {
-            "video_id": video.video_id,
-            "user_id": video.user_id,
-            "title": video.title,
-            "category": video.category,
-            "likes": like_count,
-            "comments": comment_count,
-            "views": view_count,
-            "user": {
-                "username": user.username if user else "Unknown User",
-                "profile_picture_url": user.profile_picture_url if user else "/default-avatar.png"
-            }
-        }
+        return video
     except HTTPException:
         raise
     except Exception as e:
@@ -637,22 +764,20 @@ async def record_video_view(
     db: Session = Depends(get_db)
 ):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not video:
+        # Existence check only; loading the Video row would pull the whole blob
+        exists = db.execute(
+            text(VIDEO_EXISTS_QUERY),
+            {"video_id": video_id}
+        ).first()
+        if not exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
             )
         
-        interaction = UserVideoInteraction(
-            interaction_id=str(uuid.uuid4()),
-            user_id=current_user.user_id,
-            video_id=video_id,
-            interaction_type='view'
-        )
-        db.add(interaction)
-        
-        db.commit()
+        # Written behind in batches; the request returns once the event is logged locally
+        interaction_buffer.record(current_user.user_id, video_id, 'view')
+        seen_videos.record_view(current_user.user_id, video_id)
         return {"success": True}
     except HTTPException:
         raise
@@ -677,39 +802,19 @@ async def get_user_profile(
                 detail="User not found"
             )
         
-        likes_subquery = db.query(Video.user_id, func.count(Like.like_id).label('total_likes'))\
-            .join(Like, Video.video_id == Like.video_id)\
-            .group_by(Video.user_id)\
-            .subquery()
-            
-        likes_count = db.query(likes_subquery.c.total_likes)\
-            .filter(likes_subquery.c.user_id == user_id)\
-            .scalar() or 0
-
-        videos = db.query(
-            Video.video_id,
-            Video.title,
-            func.count(UserVideoInteraction.interaction_id).label('views')
-        ).outerjoin(
-            UserVideoInteraction,
-            and_(
-                Video.video_id == UserVideoInteraction.video_id,
-                UserVideoInteraction.interaction_type == 'view'
-            )
-        ).filter(
-            Video.user_id == user_id,
-            Video.is_active == True
-        ).group_by(
-            Video.video_id,
-            Video.title
-        ).all()
+        # Served from the per-video counters, so the cost depends on this creator's videos only
+        videos = db.query(Video.video_id, Video.title, Video.is_active)\
+            .filter(Video.user_id == user_id)\
+            .all()
+        counters = video_counters.read(db, [video.video_id for video in videos])
+        likes_count = sum(counter['likes'] for counter in counters.values())
 
         videos_list = [{
             'video_id': video.video_id,
             'title': video.title,
-            'views': video.views,
+            'views': counters.get(video.video_id, {}).get('views', 0),
             'thumbnail_url': f'/api/videos/{video.video_id}/thumbnail'
-        } for video in videos]
+        } for video in videos if video.is_active]
 
         return {
             "username": user.username,
@@ -850,15 +955,15 @@ async def get_rejected_comments(db: Session = Depends(get_db)):
 @app.post("/admin/videos/{video_id}/approve")
 async def approve_video(video_id: str, db: Session = Depends(get_db)):
     try:
-        video = db.query(Video).filter(Video.video_id == video_id).first()
-        if not video:
+        updated = db.query(Video).filter(Video.video_id == video_id).update({
+            Video.moderation_status: 'approved',
+            Video.moderation_reason: 'Manually approved by admin'
+        }, synchronize_session=False)
+        if not updated:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Video not found"
             )
-            
-        video.moderation_status = 'approved'
-        video.moderation_reason = 'Manually approved by admin'
         db.commit()
         
         return {"message": "Video approved successfully"}
@@ -875,13 +980,23 @@ async def approve_video(video_id: str, db: Session = Depends(get_db)):
 @app.post("/admin/comments/{comment_id}/approve")
 async def approve_comment(comment_id: str, db: Session = Depends(get_db)):
     try:
-        comment = db.query(Comment).filter(Comment.comment_id == comment_id).first()
+        # Comment IDs are stored as BINARY(16); anything that isn't a UUID can't name one
+        try:
+            uuid.UUID(comment_id)
+        except ValueError:
+            comment = None
+        else:
+            comment = db.query(Comment).filter(Comment.comment_id == comment_id).first()
         if not comment:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Comment not found"
             )
             
+        if comment.moderation_status != 'approved' and comment.is_active:
+            video_counters.increment(db, comment.video_id, 'comments')
+        if comment.moderation_status != 'approved':
+            bump_comments_version(db, comment.video_id)
         comment.moderation_status = 'approved'
         comment.moderation_reason = 'Manually approved by admin'
         db.commit()
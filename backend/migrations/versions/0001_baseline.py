@@ -0,0 +1,195 @@
+"""Baseline schema
+
+The tables as testing/data_setup.py and create_all used to build them.
+Every statement is idempotent, so upgrading a database set up that way
+adopts it without changes.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+TABLES = {
+    'users': """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id VARCHAR(255) PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            profile_picture_url VARCHAR(255),
+            bio TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            preferences JSON,
+            is_active BOOLEAN DEFAULT true,
+            last_login TIMESTAMP
+        )
+    """,
+    'videos': """
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            video_data MEDIUMBLOB,
+            thumbnail_url VARCHAR(255),
+            category VARCHAR(512),
+            duration INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            view_count INT DEFAULT 0,
+            like_count INT DEFAULT 0,
+            comment_count INT DEFAULT 0,
+            is_active BOOLEAN DEFAULT true,
+            moderation_status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+            moderation_reason TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    'comments': """
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id VARCHAR(255) PRIMARY KEY,
+            video_id VARCHAR(255),
+            user_id VARCHAR(255),
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            like_count INT DEFAULT 0,
+            is_active BOOLEAN DEFAULT true,
+            moderation_status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+            moderation_score FLOAT,
+            moderation_labels JSON,
+            moderation_reason TEXT,
+            FOREIGN KEY (video_id) REFERENCES videos(video_id),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    """,
+    'likes': """
+        CREATE TABLE IF NOT EXISTS likes (
+            like_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            video_id VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (video_id) REFERENCES videos(video_id),
+            UNIQUE KEY unique_like (user_id, video_id)
+        )
+    """,
+    'user_video_interactions': """
+        CREATE TABLE IF NOT EXISTS user_video_interactions (
+            interaction_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            video_id VARCHAR(255),
+            interaction_type ENUM('view', 'like', 'comment', 'share'),
+            interaction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            watch_duration INT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (video_id) REFERENCES videos(video_id)
+        )
+    """,
+    'video_recommendations': """
+        CREATE TABLE IF NOT EXISTS video_recommendations (
+            recommendation_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            video_id VARCHAR(255),
+            recommendation_score FLOAT,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_shown BOOLEAN DEFAULT false,
+            is_clicked BOOLEAN DEFAULT false,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (video_id) REFERENCES videos(video_id)
+        )
+    """,
+    'moderation_history': """
+        CREATE TABLE IF NOT EXISTS moderation_history (
+            history_id VARCHAR(255) PRIMARY KEY,
+            content_type ENUM('video', 'comment'),
+            content_id VARCHAR(255),
+            moderation_action ENUM('flag', 'approve', 'reject', 'restore'),
+            action_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            moderation_reason TEXT,
+            automated BOOLEAN DEFAULT true
+        )
+    """,
+    'moderation_cache': """
+        CREATE TABLE IF NOT EXISTS moderation_cache (
+            cache_key CHAR(64) PRIMARY KEY,
+            content_type ENUM('video', 'comment') NOT NULL,
+            model_version VARCHAR(100) NOT NULL,
+            verdict JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    'user_category_daily': """
+        CREATE TABLE IF NOT EXISTS user_category_daily (
+            user_id VARCHAR(255) NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            day DATE NOT NULL,
+            views INT NOT NULL DEFAULT 0,
+            likes INT NOT NULL DEFAULT 0,
+            comments INT NOT NULL DEFAULT 0,
+            shares INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category, day),
+            INDEX idx_user_category_daily_day (day)
+        )
+    """,
+    'video_categories': """
+        CREATE TABLE IF NOT EXISTS video_categories (
+            video_id VARCHAR(255) NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            PRIMARY KEY (video_id, category),
+            INDEX idx_video_categories_category (category, video_id),
+            FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+        )
+    """,
+    'video_counter_shards': """
+        CREATE TABLE IF NOT EXISTS video_counter_shards (
+            video_id VARCHAR(255) NOT NULL,
+            counter ENUM('likes', 'comments', 'views') NOT NULL,
+            shard TINYINT UNSIGNED NOT NULL,
+            value INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (video_id, counter, shard),
+            FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+        )
+    """,
+    'job_state': """
+        CREATE TABLE IF NOT EXISTS job_state (
+            job_name VARCHAR(100) PRIMARY KEY,
+            state JSON,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+INDEXES = [
+    ('idx_videos_category', 'videos', ['category']),
+    ('idx_videos_created_at', 'videos', ['created_at']),
+    ('idx_comments_video_id', 'comments', ['video_id']),
+    ('idx_interactions_user_id', 'user_video_interactions', ['user_id']),
+    ('idx_interactions_video_id', 'user_video_interactions', ['video_id']),
+]
+
+
+def upgrade():
+    for ddl in TABLES.values():
+        op.execute(ddl)
+
+    # Older databases were created with VARCHAR(50), which truncated multi-category values
+    op.execute("ALTER TABLE videos MODIFY COLUMN category VARCHAR(512)")
+
+    # MySQL has no CREATE INDEX IF NOT EXISTS; generated SQL scripts (--sql) assume an empty database
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if inspector is None or name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table in reversed(list(TABLES)):
+        op.drop_table(table)
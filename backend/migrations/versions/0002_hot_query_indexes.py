@@ -0,0 +1,54 @@
+"""Composite indexes for the hot endpoint and worker queries
+
+likes(user_id, video_id) is already covered by the unique_like key.
+Single-column indexes that are now a prefix of a composite one are
+dropped, so writes don't maintain both.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Like counts and reconciliation per video
+    op.create_index('idx_likes_video_id', 'likes', ['video_id'])
+    # Comment listing and approved-comment counts, in created_at order
+    op.create_index(
+        'idx_comments_video_status_created',
+        'comments',
+        ['video_id', 'is_active', 'moderation_status', 'created_at']
+    )
+    # Moderation sweeps and the admin rejected-comments list
+    op.create_index('idx_comments_moderation_status', 'comments', ['moderation_status'])
+    # A user's history (seen videos), newest first
+    op.create_index('idx_interactions_user_time', 'user_video_interactions', ['user_id', 'interaction_timestamp'])
+    # View counts per video
+    op.create_index('idx_interactions_video_type', 'user_video_interactions', ['video_id', 'interaction_type'])
+    # Moderation sweeps, the admin rejected-videos list and approved-video scans
+    op.create_index('idx_videos_moderation_status', 'videos', ['moderation_status'])
+
+    # The composites above also serve the foreign keys these backed
+    op.drop_index('idx_comments_video_id', table_name='comments')
+    op.drop_index('idx_interactions_user_id', table_name='user_video_interactions')
+    op.drop_index('idx_interactions_video_id', table_name='user_video_interactions')
+
+
+def downgrade():
+    op.create_index('idx_interactions_video_id', 'user_video_interactions', ['video_id'])
+    op.create_index('idx_interactions_user_id', 'user_video_interactions', ['user_id'])
+    op.create_index('idx_comments_video_id', 'comments', ['video_id'])
+
+    op.drop_index('idx_videos_moderation_status', table_name='videos')
+    op.drop_index('idx_interactions_video_type', table_name='user_video_interactions')
+    op.drop_index('idx_interactions_user_time', table_name='user_video_interactions')
+    op.drop_index('idx_comments_moderation_status', table_name='comments')
+    op.drop_index('idx_comments_video_status_created', table_name='comments')
+    op.drop_index('idx_likes_video_id', table_name='likes')
@@ -0,0 +1,105 @@
+"""Partition user_video_interactions by month
+
+Adds video_interaction_monthly, which keeps per-video totals for months
+whose raw interactions have been archived, and range-partitions
+user_video_interactions by month on interaction_timestamp so the
+retention job in constant_run.py can drop old months instantly.
+
+MySQL does not allow foreign keys on partitioned tables and needs the
+partitioning column in every unique key, so the foreign keys are dropped
+and the primary key becomes (interaction_id, interaction_timestamp).
+The partitioning ALTER copies the table once.
+
+Downgrading removes the partitioning but cannot bring back archived rows.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from datetime import date
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Month partitions created ahead of time; the retention job keeps extending this
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_clause(first_month, last_month):
+    definitions = []
+    month = first_month
+    while month <= last_month:
+        bound = _add_months(month, 1)
+        definitions.append(
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{bound:%Y-%m-%d} 00:00:00'))"
+        )
+        month = bound
+    definitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (UNIX_TIMESTAMP(interaction_timestamp)) (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS video_interaction_monthly (
+            video_id VARCHAR(255) NOT NULL,
+            month DATE NOT NULL,
+            views INT NOT NULL DEFAULT 0,
+            likes INT NOT NULL DEFAULT 0,
+            comments INT NOT NULL DEFAULT 0,
+            shares INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (video_id, month)
+        )
+    """)
+
+    this_month = date.today().replace(day=1)
+    if context.is_offline_mode():
+        foreign_keys = ['user_video_interactions_ibfk_1', 'user_video_interactions_ibfk_2']
+        first_month = this_month
+    else:
+        bind = op.get_bind()
+        foreign_keys = [fk['name'] for fk in sa.inspect(bind).get_foreign_keys('user_video_interactions')]
+        oldest = bind.execute(sa.text("SELECT MIN(interaction_timestamp) FROM user_video_interactions")).scalar()
+        first_month = date(oldest.year, oldest.month, 1) if oldest else this_month
+
+    for name in foreign_keys:
+        op.drop_constraint(name, 'user_video_interactions', type_='foreignkey')
+
+    op.execute("UPDATE user_video_interactions SET interaction_timestamp = CURRENT_TIMESTAMP WHERE interaction_timestamp IS NULL")
+    op.execute("""
+        ALTER TABLE user_video_interactions
+            MODIFY interaction_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (interaction_id, interaction_timestamp)
+    """)
+    # Watermark lookups and time-window scans in the background jobs
+    op.create_index('idx_interactions_time', 'user_video_interactions', ['interaction_timestamp'])
+
+    op.execute(
+        "ALTER TABLE user_video_interactions "
+        + _partition_clause(first_month, _add_months(this_month, PARTITIONS_AHEAD))
+    )
+
+
+def downgrade():
+    op.execute("ALTER TABLE user_video_interactions REMOVE PARTITIONING")
+    op.drop_index('idx_interactions_time', table_name='user_video_interactions')
+    op.execute("""
+        ALTER TABLE user_video_interactions
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (interaction_id),
+            MODIFY interaction_timestamp TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP
+    """)
+    op.create_foreign_key(None, 'user_video_interactions', 'users', ['user_id'], ['user_id'])
+    op.create_foreign_key(None, 'user_video_interactions', 'videos', ['video_id'], ['video_id'])
+    op.drop_table('video_interaction_monthly')
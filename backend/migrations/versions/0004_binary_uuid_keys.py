@@ -0,0 +1,51 @@
+"""Store like, comment and interaction IDs as BINARY(16)
+
+The primary keys of the append-heavy tables go from 36-character UUID
+strings in VARCHAR(255) to 16-byte binary UUIDs. New IDs are UUIDv7
+(time-ordered, see backend/ids.py), so inserts append to the end of the
+clustered index instead of splitting random pages, and every secondary
+index entry carries 16 bytes of key instead of up to 255.
+
+Existing IDs are converted with UUID_TO_BIN and keep their value; only
+rows written from now on are time-ordered. Each table is rewritten once.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# (table, id column, other primary key columns)
+KEYS = [
+    ('likes', 'like_id', []),
+    ('comments', 'comment_id', []),
+    ('user_video_interactions', 'interaction_id', ['interaction_timestamp']),
+]
+
+
+def _convert_key(table, column, other_columns, column_type, conversion):
+    primary_key = ", ".join([column] + other_columns)
+    op.execute(f"ALTER TABLE {table} ADD COLUMN {column}_new {column_type} NULL")
+    op.execute(f"UPDATE {table} SET {column}_new = {conversion}({column})")
+    op.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, DROP COLUMN {column}")
+    op.execute(f"""
+        ALTER TABLE {table}
+            CHANGE COLUMN {column}_new {column} {column_type} NOT NULL FIRST,
+            ADD PRIMARY KEY ({primary_key})
+    """)
+
+
+def upgrade():
+    for table, column, other_columns in KEYS:
+        _convert_key(table, column, other_columns, "BINARY(16)", "UUID_TO_BIN")
+
+
+def downgrade():
+    for table, column, other_columns in KEYS:
+        _convert_key(table, column, other_columns, "VARCHAR(255)", "BIN_TO_UUID")
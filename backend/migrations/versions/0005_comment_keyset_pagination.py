@@ -0,0 +1,38 @@
+"""Keyset pagination for comments
+
+The comment listing pages by (created_at, comment_id), newest first, so
+it gets an index in exactly that order under (video_id, is_active).
+created_at becomes NOT NULL, since a NULL would fall outside every page.
+
+videos.comments_version is bumped whenever a comment is added or its
+moderation status changes; each API worker caches the first page of a
+video's comments and checks it against this version.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE comments SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    op.execute("ALTER TABLE comments MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    op.create_index(
+        'idx_comments_video_active_created',
+        'comments',
+        ['video_id', 'is_active', 'created_at', 'comment_id']
+    )
+    op.execute("ALTER TABLE videos ADD COLUMN comments_version INT NOT NULL DEFAULT 0")
+
+
+def downgrade():
+    op.execute("ALTER TABLE videos DROP COLUMN comments_version")
+    op.drop_index('idx_comments_video_active_created', table_name='comments')
+    op.execute("ALTER TABLE comments MODIFY created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP")
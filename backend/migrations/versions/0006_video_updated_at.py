@@ -0,0 +1,31 @@
+"""Track when each video row last changed
+
+videos.updated_at is maintained by MySQL on every change to the row,
+counter increments included. The model update job in constant_run.py
+reads only the videos changed since its last run through this index,
+instead of aggregating the event tables.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "ALTER TABLE videos ADD COLUMN updated_at TIMESTAMP NOT NULL "
+        "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+    )
+    op.create_index('idx_videos_updated_at', 'videos', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('idx_videos_updated_at', table_name='videos')
+    op.execute("ALTER TABLE videos DROP COLUMN updated_at")
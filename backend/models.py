@@ -1,6 +1,9 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, JSON, Enum, Float, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, Text, JSON, Enum, Float, ForeignKey, UniqueConstraint, LargeBinary
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from database import Base
+from ids import BinaryUUID
 
 class User(Base):
     __tablename__ = "users"
@@ -23,14 +26,19 @@ class Video(Base):
     user_id = Column(String(255), ForeignKey('users.user_id'))
     title = Column(String(255), nullable=False)
     description = Column(Text)
-    video_data = Column(String(255)) 
+    # Never loaded with the row; only the streaming and moderation paths read the bytes, with explicit queries
+    video_data = deferred(Column(LargeBinary().with_variant(MEDIUMBLOB(), 'mysql')), raiseload=True)
     thumbnail_url = Column(String(255))
-    category = Column(String(50))
+    category = Column(String(512))
     duration = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # ON UPDATE CURRENT_TIMESTAMP in MySQL; the model update job reads videos changed since its last run
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
     comment_count = Column(Integer, default=0)
+    # Bumped on every comment added or moderated, to validate cached comment pages
+    comments_version = Column(Integer, nullable=False, default=0)
     is_active = Column(Boolean, default=True)
     moderation_status = Column(Enum('pending', 'approved', 'rejected', name='moderation_status'), default='pending')
     moderation_reason = Column(Text)
@@ -38,11 +46,11 @@ class Video(Base):
 class Comment(Base):
     __tablename__ = "comments"
 
-    comment_id = Column(String(255), primary_key=True)
+    comment_id = Column(BinaryUUID, primary_key=True)
     video_id = Column(String(255), ForeignKey('videos.video_id'))
     user_id = Column(String(255), ForeignKey('users.user_id'))
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     like_count = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
     moderation_status = Column(Enum('pending', 'approved', 'rejected', name='moderation_status'), default='pending')
@@ -53,7 +61,7 @@ class Comment(Base):
 class Like(Base):
     __tablename__ = "likes"
 
-    like_id = Column(String(255), primary_key=True)
+    like_id = Column(BinaryUUID, primary_key=True)
     user_id = Column(String(255), ForeignKey('users.user_id'))
     video_id = Column(String(255), ForeignKey('videos.video_id'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -62,11 +70,13 @@ class Like(Base):
 class UserVideoInteraction(Base):
     __tablename__ = "user_video_interactions"
 
-    interaction_id = Column(String(255), primary_key=True)
-    user_id = Column(String(255), ForeignKey('users.user_id'))
-    video_id = Column(String(255), ForeignKey('videos.video_id'))
+    # Range-partitioned by month on interaction_timestamp, so no foreign keys
+    # and the timestamp is part of the primary key
+    interaction_id = Column(BinaryUUID, primary_key=True)
+    user_id = Column(String(255))
+    video_id = Column(String(255))
     interaction_type = Column(Enum('view', 'like', 'comment', 'share', name='interaction_type'))
-    interaction_timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    interaction_timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     watch_duration = Column(Integer)
 
 class VideoRecommendation(Base):
@@ -89,4 +99,55 @@ class ModerationHistory(Base):
     moderation_action = Column(Enum('flag', 'approve', 'reject', 'restore', name='moderation_action'))
     action_timestamp = Column(DateTime(timezone=True), server_default=func.now())
     moderation_reason = Column(Text)
-    automated = Column(Boolean, default=True) 
\ No newline at end of file
+    automated = Column(Boolean, default=True) 
+
+class ModerationCache(Base):
+    __tablename__ = "moderation_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    content_type = Column(Enum('video', 'comment', name='content_type'), nullable=False)
+    model_version = Column(String(100), nullable=False)
+    verdict = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class VideoCategory(Base):
+    __tablename__ = "video_categories"
+
+    video_id = Column(String(255), ForeignKey('videos.video_id', ondelete='CASCADE'), primary_key=True)
+    category = Column(String(100), primary_key=True, index=True)
+
+class VideoCounterShard(Base):
+    __tablename__ = "video_counter_shards"
+
+    video_id = Column(String(255), ForeignKey('videos.video_id', ondelete='CASCADE'), primary_key=True)
+    counter = Column(Enum('likes', 'comments', 'views', name='video_counter'), primary_key=True)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    value = Column(Integer, default=0, nullable=False)
+
+class VideoInteractionMonthly(Base):
+    __tablename__ = "video_interaction_monthly"
+
+    video_id = Column(String(255), primary_key=True)
+    month = Column(Date, primary_key=True)
+    views = Column(Integer, default=0, nullable=False)
+    likes = Column(Integer, default=0, nullable=False)
+    comments = Column(Integer, default=0, nullable=False)
+    shares = Column(Integer, default=0, nullable=False)
+
+class UserCategoryDaily(Base):
+    __tablename__ = "user_category_daily"
+
+    user_id = Column(String(255), primary_key=True)
+    category = Column(String(100), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, default=0, nullable=False)
+    likes = Column(Integer, default=0, nullable=False)
+    comments = Column(Integer, default=0, nullable=False)
+    shares = Column(Integer, default=0, nullable=False)
+
+class JobState(Base):
+    __tablename__ = "job_state"
+
+    job_name = Column(String(100), primary_key=True)
+    state = Column(JSON)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import json
+import queue
+import threading
+import urllib.request
+from datetime import datetime
+
+MODERATION_EVENTS_URL = os.getenv(
+    "MODERATION_EVENTS_URL",
+    f"http://127.0.0.1:{os.getenv('MODERATION_EVENTS_PORT', '5177')}/events"
+)
+
+MODERATION_SERVICE_URL = os.getenv(
+    "MODERATION_SERVICE_URL",
+    f"http://127.0.0.1:{os.getenv('MODERATION_EVENTS_PORT', '5177')}/moderate"
+)
+# How long create_comment waits for an inline verdict before leaving the comment pending
+COMMENT_MODERATION_TIMEOUT = float(os.getenv("COMMENT_MODERATION_TIMEOUT_MS", "250")) / 1000
+
+_events = queue.Queue()
+_sender = None
+_sender_lock = threading.Lock()
+
+def _send_loop():
+    while True:
+        items = [_events.get()]
+        # Drain whatever else arrived so bursts go out in a single request
+        while len(items) < 100:
+            try:
+                items.append(_events.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            request = urllib.request.Request(
+                MODERATION_EVENTS_URL,
+                data=json.dumps({"items": items}).encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            urllib.request.urlopen(request, timeout=2).close()
+        except Exception as e:
+            # The moderation worker's periodic sweep will still pick these up
+            print(f"[{datetime.now()}] Could not publish moderation events: {e}")
+
+def publish_pending(content_type, content_id):
+    """Notify the moderation worker that a new `comment` or `video` is waiting. Never blocks."""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                _sender = threading.Thread(target=_send_loop, name="moderation-events", daemon=True)
+                _sender.start()
+    _events.put({"type": content_type, "id": content_id})
+
+def moderate_comment_inline(text):
+    """
+    Ask the moderation service for a verdict on `text`. Returns a dict with
+    status, labels, score and reason, or None if the service is unavailable
+    or slower than COMMENT_MODERATION_TIMEOUT. Blocking; call from a threadpool.
+    """
+    try:
+        request = urllib.request.Request(
+            MODERATION_SERVICE_URL,
+            data=json.dumps({"text": text}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=COMMENT_MODERATION_TIMEOUT) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        print(f"[{datetime.now()}] Inline comment moderation unavailable: {e}")
+        return None
@@ -0,0 +1,112 @@
+"""
+SQL shared by the API, the background worker in backend_constant/ and
+testing/check_query_plans.py, which runs EXPLAIN on these exact strings.
+"""
+
+# Every category a video is tagged with, from the join table, since videos.category can be truncated
+CATEGORY_LIST = "GROUP_CONCAT(category ORDER BY category SEPARATOR ', ')"
+
+# Per-video category list, to LEFT JOIN as `vc` and read with COALESCE(vc.categories, v.category)
+VIDEO_CATEGORIES_QUERY = f"""
+    SELECT video_id, {CATEGORY_LIST} AS categories
+    FROM video_categories GROUP BY video_id
+"""
+
+VIDEO_EXISTS_QUERY = "SELECT 1 FROM videos WHERE video_id = :video_id LIMIT 1"
+
+COMMENTS_VERSION_QUERY = "SELECT comments_version FROM videos WHERE video_id = :video_id"
+
+# One page of a video's visible comments, newest first. {keyset} is empty
+# for the first page and COMMENT_PAGE_AFTER for the ones after it.
+COMMENT_PAGE_QUERY = """
+    SELECT 
+        BIN_TO_UUID(c.comment_id) AS comment_id,
+        c.video_id,
+        c.user_id,
+        c.content,
+        c.created_at,
+        c.like_count,
+        c.moderation_status,
+        u.username,
+        u.profile_picture_url
+    FROM comments c
+    JOIN users u ON c.user_id = u.user_id
+    WHERE c.video_id = :video_id
+        AND c.is_active = true
+        AND (c.moderation_status = 'approved' OR c.moderation_status = 'pending'){keyset}
+    ORDER BY c.created_at DESC, c.comment_id DESC
+    LIMIT :limit
+"""
+
+COMMENT_PAGE_AFTER = """
+        AND (c.created_at < :created_at
+            OR (c.created_at = :created_at AND c.comment_id < UUID_TO_BIN(:comment_id)))
+"""
+
+# Counters including unfolded shards; {placeholders} is the `:video_N` parameter list
+VIDEO_COUNTERS_QUERY = """
+    SELECT
+        v.video_id,
+        GREATEST(v.like_count + COALESCE(s.likes, 0), 0) as likes,
+        GREATEST(v.comment_count + COALESCE(s.comments, 0), 0) as comments,
+        GREATEST(v.view_count + COALESCE(s.views, 0), 0) as views
+    FROM videos v
+    LEFT JOIN (
+        SELECT
+            video_id,
+            SUM(CASE WHEN counter = 'likes' THEN value ELSE 0 END) as likes,
+            SUM(CASE WHEN counter = 'comments' THEN value ELSE 0 END) as comments,
+            SUM(CASE WHEN counter = 'views' THEN value ELSE 0 END) as views
+        FROM video_counter_shards
+        WHERE video_id IN ({placeholders})
+        GROUP BY video_id
+    ) s ON s.video_id = v.video_id
+    WHERE v.video_id IN ({placeholders})
+"""
+
+USER_PREFERENCES_QUERY = """
+    SELECT category,
+        SUM(views * 0.5 + likes * 1.0 + comments * 2.0 + shares * 2.0) AS score
+    FROM user_category_daily
+    WHERE user_id = :user_id
+    AND day >= CURDATE() - INTERVAL 30 DAY
+    GROUP BY category
+    ORDER BY score DESC
+"""
+
+USER_VIEWED_VIDEOS_QUERY = """
+    SELECT DISTINCT video_id 
+    FROM user_video_interactions 
+    WHERE user_id = :user_id
+"""
+
+# Moderation sweeps; {id_filter} narrows them to the IDs a notification named
+PENDING_COMMENTS_QUERY = """
+    SELECT BIN_TO_UUID(comment_id) AS comment_id, video_id, content
+    FROM comments
+    WHERE moderation_status = 'pending'{id_filter}
+"""
+
+PENDING_VIDEOS_QUERY = """
+    SELECT video_id, title
+    FROM videos
+    WHERE moderation_status = 'pending'{id_filter}
+"""
+
+# Approved videos changed since the last model update. A correlated
+# lookup, so only the changed videos' categories are read.
+CHANGED_VIDEOS_QUERY = f"""
+    SELECT 
+        v.video_id,
+        v.user_id,
+        v.title,
+        COALESCE(
+            (SELECT {CATEGORY_LIST} FROM video_categories vc WHERE vc.video_id = v.video_id),
+            v.category
+        ) as category,
+        v.like_count as likes,
+        v.comment_count as comments,
+        v.view_count as views
+    FROM videos v
+    WHERE v.updated_at >= :since AND v.moderation_status = 'approved'
+"""
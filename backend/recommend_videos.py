@@ -5,12 +5,14 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from mysql.connector import Error
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import pickle
 from datetime import datetime
 from pathlib import Path
 import time
 
+from queries import VIDEO_CATEGORIES_QUERY, USER_PREFERENCES_QUERY, USER_VIEWED_VIDEOS_QUERY
+
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 
 DATABASE_URL = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
@@ -18,22 +20,19 @@ engine = create_engine(DATABASE_URL)
 
 def load_video_data_from_mysql():
     try:
-        query = """
+        query = f"""
             SELECT 
                 v.video_id,
                 v.user_id,
                 v.title,
-                v.category,
+                COALESCE(vc.categories, v.category) as category,
                 v.is_active,
-                COALESCE(COUNT(DISTINCT l.like_id), 0) as likes,
-                COALESCE(COUNT(DISTINCT c.comment_id), 0) as comments,
-                COALESCE(COUNT(DISTINCT i.interaction_id), 0) as views
+                v.like_count as likes,
+                v.comment_count as comments,
+                v.view_count as views
             FROM videos v
-            LEFT JOIN likes l ON v.video_id = l.video_id
-            LEFT JOIN comments c ON v.video_id = c.video_id
-            LEFT JOIN user_video_interactions i ON v.video_id = i.video_id AND i.interaction_type = 'view'
+            LEFT JOIN ({VIDEO_CATEGORIES_QUERY}) vc ON v.video_id = vc.video_id
             WHERE v.is_active = true
-            GROUP BY v.video_id, v.user_id, v.title, v.category, v.is_active
         """
         
         df = pd.read_sql(query, engine)
@@ -99,7 +98,11 @@ def cleanup_old_models(model_dir: Path):
     except Exception as e:
         print(f"Error cleaning up old models: {e}")
 
+_loaded_model = (None, None)
+
 def load_recommendation_model():
+    """Return the newest saved model, unpickling it only when a newer version has been published."""
+    global _loaded_model
     try:
         model_dir = Path(__file__).parent / 'model'
         
@@ -110,30 +113,27 @@ def load_recommendation_model():
             return None
             
         latest_model = max(model_files, key=lambda x: x.stat().st_mtime)
+        if latest_model == _loaded_model[0]:
+            return _loaded_model[1]
+        
         print(f"Loading model: {latest_model.name}")
         
         cleanup_old_models(model_dir)
             
         with open(latest_model, 'rb') as f:
-            return pickle.load(f)
+            model_data = pickle.load(f)
+        _loaded_model = (latest_model, model_data)
+        return model_data
             
     except Exception as e:
         print(f"Error loading recommendation model: {e}")
         return None
 
 def get_user_preferences(user_id):
-    """Get user's viewing preferences from their history."""
+    """Get user's top categories from the last 30 days of the daily engagement rollup."""
     try:
-        query = """
-            SELECT DISTINCT v.category
-            FROM user_video_interactions i
-            JOIN videos v ON i.video_id = v.video_id
-            WHERE i.user_id = %s
-            AND i.interaction_timestamp >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        """
-        
-        df = pd.read_sql(query, engine, params=(user_id,))
-        return df['category'].unique().tolist()
+        df = pd.read_sql(text(USER_PREFERENCES_QUERY), engine, params={'user_id': user_id})
+        return df['category'].tolist()
         
     except Exception as e:
         print(f"Error getting user preferences: {e}")
@@ -141,20 +141,14 @@ def get_user_preferences(user_id):
 
 def get_user_viewed_videos(user_id):
     try:
-        query = """
-            SELECT DISTINCT video_id 
-            FROM user_video_interactions 
-            WHERE user_id = %s
-        """
-        
-        df = pd.read_sql(query, engine, params=(user_id,))
+        df = pd.read_sql(text(USER_VIEWED_VIDEOS_QUERY), engine, params={'user_id': user_id})
         return df['video_id'].tolist()
         
     except Exception as e:
         print(f"Error getting viewed videos: {e}")
         return []
 
-def recommend_videos(categories, viewed_video_ids=None, top_n=8):
+def recommend_videos(categories, viewed_video_ids=None, top_n=8, model_data=None, seen_mask=None):
     """
     Recommend videos based on categories and viewing history.
     
@@ -162,6 +156,9 @@ def recommend_videos(categories, viewed_video_ids=None, top_n=8):
         categories (list): List of category names to base recommendations on
         viewed_video_ids (list, optional): List of video IDs to exclude from recommendations
         top_n (int, optional): Number of recommendations to return. Defaults to 8.
+        model_data (dict, optional): Model artifact to use instead of the latest saved one.
+        seen_mask (np.ndarray, optional): Boolean mask over the model's videos to exclude,
+            used instead of viewed_video_ids.
     
     Returns:
         list: List of recommended video dictionaries
@@ -169,49 +166,72 @@ def recommend_videos(categories, viewed_video_ids=None, top_n=8):
     try:
         viewed_video_ids = viewed_video_ids or []
         
-        model_data = load_recommendation_model()
+        model_data = model_data or load_recommendation_model()
         if not model_data:
             print("No recommendation model available")
             return []
         
-        df = model_data['video_data']
+        if 'category_index' not in model_data:
+            print("Recommendation model predates the category index, waiting for the next training run")
+            return []
         
-        df_filtered = df[~df['video_id'].isin(viewed_video_ids)]
+        df = model_data['video_data']
+        if seen_mask is not None:
+            candidates = ~seen_mask
+        else:
+            candidates = ~df['video_id'].isin(viewed_video_ids).to_numpy()
         
         if categories:
-            # Convert categories to lowercase for case-insensitive matching
-            categories_lower = [cat.lower() for cat in categories]
-            df_filtered = df_filtered[
-                df_filtered['category'].str.lower().apply(
-                    lambda x: any(cat in x.lower() for cat in categories_lower)
-                )
-            ]
+            # Set union over the inverted index instead of scanning category strings
+            index = model_data['category_index']
+            wanted = {
+                name.strip().lower()
+                for category in categories
+                for name in category.split(',')
+                if name.strip()
+            }
+            matched = [index[name] for name in wanted if name in index]
+            preferred_rows = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int32)
+            in_categories = np.zeros(len(df), dtype=bool)
+            in_categories[preferred_rows] = True
+            candidates &= in_categories
+        
+        candidate_rows = np.flatnonzero(candidates)
+        if len(candidate_rows) == 0:
+            return []
         
-        # Calculate recommendation scores
-        similarity_scores = model_data['similarity_matrix']
+        if categories:
+            # Average similarity to every video in the preferred categories, computed
+            # per distinct category string since similarity only depends on that
+            codes = df['category'].cat.codes.to_numpy()
+            similarity = model_data['category_similarity']
+            weights = np.bincount(codes[preferred_rows], minlength=len(similarity)).astype(np.float32)
+            category_sim = (weights @ similarity / len(preferred_rows))[codes[candidate_rows]]
+        else:
+            category_sim = 0.5
         
         # Combine similarity and engagement scores
-        final_scores = []
-        for idx, row in df_filtered.iterrows():
-            # Get average similarity with preferred categories
-            category_sim = np.mean([
-                similarity_scores[i][idx]
-                for i in range(len(df))
-                if any(cat.lower() in df.iloc[i]['category'].lower() for cat in categories)
-            ]) if categories else 0.5
-            
-            # Combine with engagement score
-            final_score = (category_sim * 0.7) + (row['engagement_score'] * 0.3)
-            final_scores.append(final_score)
-        
-        df_filtered['final_score'] = final_scores
-        
-        # Sort and get top recommendations
-        recommendations = df_filtered.nlargest(top_n, 'final_score')
+        final_scores = (category_sim * 0.7) + (df['engagement_score'].to_numpy()[candidate_rows] * 0.3)
+        top_rows = candidate_rows[np.argsort(-final_scores, kind='stable')[:top_n]]
+        recommendations = df.iloc[top_rows]
         
         # Return recommendations with user_id
-        return recommendations[['video_id', 'user_id', 'title', 'category', 'likes', 'comments', 'views']].to_dict(orient='records')
+        return recommendations[['video_id', 'user_id', 'title', 'category', 'likes', 'comments', 'views']].astype(
+            {'video_id': str, 'user_id': str, 'category': str}
+        ).to_dict(orient='records')
         
     except Exception as e:
         print(f"Error generating recommendations: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def random_unseen_videos(model_data, seen_mask, exclude_ids=(), n=2):
+    """Pick `n` random videos from the model that are neither seen nor in `exclude_ids`."""
+    df = model_data['video_data']
+    available = ~seen_mask & ~df['video_id'].isin(list(exclude_ids)).to_numpy()
+    rows = np.flatnonzero(available)
+    if len(rows) == 0:
+        return []
+    picked = np.random.choice(rows, size=min(n, len(rows)), replace=False)
+    return df.iloc[picked][['video_id', 'user_id', 'title', 'category', 'likes', 'comments', 'views']].astype(
+        {'video_id': str, 'user_id': str, 'category': str}
+    ).to_dict(orient='records')
@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class SeenSet:
+    """
+    Row positions (in one model version) of the videos a user has seen.
+
+    Kept as a sorted int32 array while sparse and switched to a packed
+    bitmap once that is smaller, the same trade-off roaring bitmaps make
+    per container. Either way `mask()` never depends on how long the
+    user's raw interaction history is.
+    """
+
+    def __init__(self, size, rows=()):
+        self.size = size
+        self._rows = np.unique(np.asarray(rows, dtype=np.int32))
+        self._bits = None
+        self._maybe_pack()
+
+    def _maybe_pack(self):
+        if self._bits is None and len(self._rows) * 4 > self.size / 8:
+            dense = np.zeros(self.size, dtype=bool)
+            dense[self._rows] = True
+            self._bits = np.packbits(dense)
+            self._rows = None
+
+    def add(self, row):
+        if self._bits is not None:
+            self._bits[row >> 3] |= np.uint8(0x80 >> (row & 7))
+            return
+        position = np.searchsorted(self._rows, row)
+        if position < len(self._rows) and self._rows[position] == row:
+            return
+        self._rows = np.insert(self._rows, position, row)
+        self._maybe_pack()
+
+    def grow(self, size):
+        """Make room for rows appended to the model; existing rows keep their positions."""
+        if size <= self.size:
+            return
+        if self._bits is not None:
+            bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+            bits[:len(self._bits)] = self._bits
+            self._bits = bits
+        self.size = size
+
+    def mask(self, size=None):
+        """Boolean array over the first `size` model rows (all of them by default), True where seen."""
+        size = self.size if size is None else size
+        if self._bits is not None:
+            return np.unpackbits(self._bits, count=size).astype(bool)
+        dense = np.zeros(size, dtype=bool)
+        dense[self._rows[self._rows < size]] = True
+        return dense
+
+    @property
+    def nbytes(self):
+        return self._bits.nbytes if self._bits is not None else self._rows.nbytes
+
+
+class SeenVideosCache:
+    """
+    In-memory LRU of SeenSets for the current model version.
+
+    A user's set is built once from `load_viewed(user_id)` (a list of video
+    IDs) and then kept current by `record_view`. Incremental model updates
+    only append rows, so the sets are grown and kept; everything is dropped
+    when a full retrain (a new `trained_at`) may have moved rows. Each API
+    worker process has its own cache, so views recorded by another worker
+    show up after the next retrain at the latest.
+    """
+
+    def __init__(self, load_viewed, capacity=10000):
+        self.load_viewed = load_viewed
+        self.capacity = capacity
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_key = None
+        self._layout_key = None
+        self._rows_by_id = None
+
+    def _sync_model(self, model_data):
+        key = model_data.get('version') or model_data.get('updated_at') or model_data.get('trained_at')
+        with self._lock:
+            if key == self._model_key:
+                return self._rows_by_id
+            rows_by_id = pd.Index(model_data['video_data']['video_id'].astype(str))
+            old = self._rows_by_id
+            if (
+                old is not None
+                and model_data.get('trained_at') == self._layout_key
+                and len(rows_by_id) < len(old)
+                and old[:len(rows_by_id)].equals(rows_by_id)
+            ):
+                # A request still holding the previous update's model; the cache has already moved on
+                return rows_by_id
+            same_layout = (
+                old is not None
+                and model_data.get('trained_at') == self._layout_key
+                and len(rows_by_id) >= len(old)
+                and rows_by_id[:len(old)].equals(old)
+            )
+            if same_layout:
+                for seen in self._sets.values():
+                    seen.grow(len(rows_by_id))
+            else:
+                self._sets.clear()
+            self._rows_by_id = rows_by_id
+            self._layout_key = model_data.get('trained_at')
+            self._model_key = key
+            return rows_by_id
+
+    def mask(self, user_id, model_data, allow=None):
+        """Seen mask over `model_data`'s rows for `user_id`, with video `allow` left unmasked."""
+        rows_by_id = self._sync_model(model_data)
+        with self._lock:
+            seen = self._sets.get(user_id)
+            if seen is not None:
+                self._sets.move_to_end(user_id)
+
+        if seen is None:
+            rows = rows_by_id.get_indexer(self.load_viewed(user_id))
+            seen = SeenSet(len(rows_by_id), rows[rows >= 0])
+            with self._lock:
+                if rows_by_id is self._rows_by_id:
+                    self._sets[user_id] = seen
+                    while len(self._sets) > self.capacity:
+                        self._sets.popitem(last=False)
+
+        # Sized to this request's model; the set may already have grown for a newer one
+        mask = seen.mask(len(rows_by_id))
+        if allow is not None:
+            row = rows_by_id.get_indexer([allow])[0]
+            if row >= 0:
+                mask[row] = False
+        return mask
+
+    def record_view(self, user_id, video_id):
+        with self._lock:
+            seen = self._sets.get(user_id)
+            if seen is None:
+                return
+            row = self._rows_by_id.get_indexer([video_id])[0]
+            if row >= 0:
+                seen.add(row)
@@ -0,0 +1,84 @@
+import time
+import random
+import threading
+
+from sqlalchemy import text
+
+from queries import VIDEO_COUNTERS_QUERY
+
+COUNTER_COLUMNS = {
+    'likes': 'like_count',
+    'comments': 'comment_count',
+    'views': 'view_count'
+}
+
+
+class VideoCounters:
+    """
+    Like, comment and view counters kept on the videos row.
+
+    Each change is one atomic `UPDATE videos SET like_count = like_count + 1`,
+    so concurrent requests never lose an update and the row lock is only
+    held for that statement. With `shards` set, a video that gets more than
+    `hot_threshold` updates within `hot_window` seconds in this process is
+    treated as hot: its updates go to one of `shards` random rows in
+    video_counter_shards instead of queueing on the single videos row.
+    constant_run.py folds the shards back into the videos row, and `read`
+    adds whatever has not been folded yet.
+    """
+
+    def __init__(self, shards=0, hot_threshold=20, hot_window=1.0):
+        self.shards = shards
+        self.hot_threshold = hot_threshold
+        self.hot_window = hot_window
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def _is_hot(self, video_id):
+        if not self.shards:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._recent.get(video_id, (now, 0))
+            if now - started > self.hot_window:
+                started, count = now, 0
+            self._recent[video_id] = (started, count + 1)
+            if len(self._recent) > 10000:
+                self._recent = {
+                    key: value for key, value in self._recent.items()
+                    if now - value[0] <= self.hot_window
+                }
+            return count + 1 > self.hot_threshold
+
+    def increment(self, db, video_id, counter, delta=1):
+        """Add `delta` to a video's counter as part of `db`'s current transaction."""
+        column = COUNTER_COLUMNS[counter]
+        if self._is_hot(video_id):
+            db.execute(text("""
+                INSERT INTO video_counter_shards (video_id, counter, shard, value)
+                VALUES (:video_id, :counter, :shard, :delta)
+                ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+            """), {
+                "video_id": video_id,
+                "counter": counter,
+                "shard": random.randrange(self.shards),
+                "delta": delta
+            })
+        else:
+            db.execute(
+                text(f"UPDATE videos SET {column} = GREATEST({column} + :delta, 0) WHERE video_id = :video_id"),
+                {"video_id": video_id, "delta": delta}
+            )
+
+    def read(self, db, video_ids):
+        """Current likes, comments and views for each of `video_ids`, including unfolded shards."""
+        video_ids = list(dict.fromkeys(str(video_id) for video_id in video_ids))
+        if not video_ids:
+            return {}
+        params = {f"video_{i}": video_id for i, video_id in enumerate(video_ids)}
+        placeholders = ", ".join(f":video_{i}" for i in range(len(video_ids)))
+        rows = db.execute(text(VIDEO_COUNTERS_QUERY.format(placeholders=placeholders)), params)
+        return {
+            row.video_id: {"likes": int(row.likes), "comments": int(row.comments), "views": int(row.views)}
+            for row in rows
+        }
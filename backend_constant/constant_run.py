@@ -2,12 +2,10 @@ import os
 import time
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 import pickle
-from datetime import datetime
+from datetime import datetime, timedelta
 import schedule
 from pathlib import Path
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
@@ -15,7 +13,29 @@ import torch
 import google.generativeai as genai
 import json
 import tempfile
+import threading
+import signal
+import asyncio
+import sys
 from google.ai.generativelanguage_v1beta.types import content
+from moderation_events import PendingQueue, ModerationEventListener, start_event_worker
+from job_runner import JobRunner
+from video_moderation import GeminiClient, VideoModerationPipeline
+from moderation_cache import ModerationCache, file_sha256
+from micro_batcher import MicroBatcher
+from training_data import (
+    compact_chunk, concat_compact, build_recommendation_model,
+    append_videos, set_engagement_counts, trace_peak_memory
+)
+from preferences import build_daily_rollup, compute_category_affinity, select_preferred_categories
+from interaction_archive import (
+    FUTURE_PARTITION, month_start, add_months, month_end,
+    partition_month, partition_definitions, archive_path, write_parquet
+)
+
+# SQL shared with the API; appended so this directory's modules keep precedence
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+from queries import VIDEO_CATEGORIES_QUERY, PENDING_COMMENTS_QUERY, PENDING_VIDEOS_QUERY, CHANGED_VIDEOS_QUERY
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 
@@ -23,7 +43,85 @@ genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 DATABASE_URL = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
 
+MODERATION_EVENTS_PORT = int(os.getenv("MODERATION_EVENTS_PORT", "5177"))
+# Pending items normally arrive as events; polling only catches anything that was missed
+MODERATION_POLL_MINUTES = int(os.getenv("MODERATION_POLL_MINUTES", "30"))
+JOB_STATS_MINUTES = int(os.getenv("JOB_STATS_MINUTES", "15"))
+VIDEO_MODERATION_CONCURRENCY = int(os.getenv("VIDEO_MODERATION_CONCURRENCY", "4"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "30"))
+# "full" uploads the whole MP4; "keyframes" submits a sampled frame set and falls back to full when unsure
+VIDEO_MODERATION_MODE = os.getenv("VIDEO_MODERATION_MODE", "full")
+KEYFRAME_BUDGET = int(os.getenv("KEYFRAME_BUDGET", "8"))
+KEYFRAME_STRATEGY = os.getenv("KEYFRAME_STRATEGY", "scene")
+KEYFRAME_MIN_SECONDS = float(os.getenv("KEYFRAME_MIN_SECONDS", "15"))
+# Inline comment moderation gathers concurrent requests for up to this long before running a batch
+COMMENT_BATCH_SIZE = int(os.getenv("COMMENT_BATCH_SIZE", "32"))
+COMMENT_BATCH_WAIT_MS = float(os.getenv("COMMENT_BATCH_WAIT_MS", "10"))
+TRAINING_CHUNK_ROWS = int(os.getenv("TRAINING_CHUNK_ROWS", "50000"))
+MODEL_UPDATE_MINUTES = int(os.getenv("MODEL_UPDATE_MINUTES", "10"))
+MODEL_UPDATE_OVERLAP_SECONDS = 60
+TRAINING_MEMORY_REPORT = os.getenv("TRAINING_MEMORY_REPORT", "false").lower() == "true"
+# User preferences: recency-decayed engagement per category, LLM only breaks near ties
+PREFERENCE_WINDOW_DAYS = int(os.getenv("PREFERENCE_WINDOW_DAYS", "30"))
+PREFERENCE_HALF_LIFE_DAYS = float(os.getenv("PREFERENCE_HALF_LIFE_DAYS", "7"))
+PREFERENCE_MIN_SHARE = float(os.getenv("PREFERENCE_MIN_SHARE", "0.15"))
+PREFERENCE_LLM_RERANK = os.getenv("PREFERENCE_LLM_RERANK", "false").lower() == "true"
+PREFERENCE_LLM_MAX_USERS = int(os.getenv("PREFERENCE_LLM_MAX_USERS", "200"))
+PREFERENCE_FULL_REFRESH_DAYS = int(os.getenv("PREFERENCE_FULL_REFRESH_DAYS", "7"))
+PREFERENCE_WATERMARK_OVERLAP_MINUTES = 10
+PREFERENCE_CHUNK_ROWS = 500_000
+PREFERENCE_USER_BATCH = 1000
+PREFERENCE_WRITE_BATCH = 1000
+ROLLUP_REFRESH_MINUTES = int(os.getenv("ROLLUP_REFRESH_MINUTES", "15"))
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "90"))
+# Hot-video counter increments sit in video_counter_shards until folded into the videos row
+COUNTER_FOLD_SECONDS = int(os.getenv("COUNTER_FOLD_SECONDS", "60"))
+VIDEO_COUNTER_COLUMNS = {'likes': 'like_count', 'comments': 'comment_count', 'views': 'view_count'}
+# Raw interactions are kept this many whole months, then archived to Parquet and dropped
+INTERACTION_RETENTION_MONTHS = int(os.getenv("INTERACTION_RETENTION_MONTHS", "6"))
+INTERACTION_ARCHIVE_DIR = os.getenv("INTERACTION_ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "interaction_archive"))
+INTERACTION_PARTITIONS_AHEAD = 3
+ARCHIVE_CHUNK_ROWS = 100_000
+
+# Per-video views: live interactions plus the months already archived out of them
+VIDEO_VIEWS_QUERY = """
+    SELECT video_id, SUM(views) as views FROM (
+        SELECT video_id, COUNT(*) as views FROM user_video_interactions
+        WHERE interaction_type = 'view' GROUP BY video_id
+        UNION ALL
+        SELECT video_id, SUM(views) FROM video_interaction_monthly GROUP BY video_id
+    ) counted GROUP BY video_id
+"""
+
+# Per-(user, category, day, type) interaction counts for one slice of user_category_daily
+ROLLUP_COUNTS_QUERY = f"""
+    SELECT i.user_id, COALESCE(vc.categories, v.category) AS category,
+        DATE(i.interaction_timestamp) AS day, i.interaction_type, COUNT(*) AS n
+    FROM user_video_interactions i
+    INNER JOIN videos v ON i.video_id = v.video_id
+    LEFT JOIN ({VIDEO_CATEGORIES_QUERY}) vc ON v.video_id = vc.video_id
+    WHERE i.interaction_timestamp >= :slice_start AND i.interaction_timestamp < :slice_end
+    GROUP BY i.user_id, COALESCE(vc.categories, v.category), DATE(i.interaction_timestamp), i.interaction_type
+"""
+
+ROLLUP_UPSERT_QUERY = """
+    INSERT INTO user_category_daily (user_id, category, day, views, likes, comments, shares)
+    VALUES (:user_id, :category, :day, :views, :likes, :comments, :shares)
+    ON DUPLICATE KEY UPDATE
+        views = views + VALUES(views), likes = likes + VALUES(likes),
+        comments = comments + VALUES(comments), shares = shares + VALUES(shares)
+"""
+
+_engine = None
+_video_client = None
+_preference_model = None
+_model_data = None
+
 def get_db_connection():
+    global _engine
+    if _engine is not None:
+        return _engine
+
     max_retries = 3
     retry_delay = 5
     
@@ -38,6 +136,7 @@ def get_db_connection():
             # Test the connection
             with engine.connect() as connection:
                 connection.execute(text("SELECT 1"))
+            _engine = engine
             return engine
         except Exception as e:
             print(f"[{datetime.now()}] Database connection attempt {attempt + 1} failed: {e}")
@@ -76,133 +175,166 @@ moderation_model = AutoModelForSequenceClassification.from_pretrained("Vrandan/C
 moderation_tokenizer = AutoTokenizer.from_pretrained("Vrandan/Comment-Moderation")
 print("Comment moderation model loaded successfully")
 
-def analyze_comment(text):
-    try:
-        inputs = moderation_tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = moderation_model(**inputs)
-        probabilities = outputs.logits.softmax(dim=-1).squeeze()
-        
-        labels = [moderation_model.config.id2label[i] for i in range(len(probabilities))]
-        predictions = sorted(zip(labels, probabilities), key=lambda x: x[1], reverse=True)
-        
+# Model versions are part of the cache key so a model upgrade never reuses stale verdicts
+COMMENT_MODEL_VERSION = os.getenv("COMMENT_MODEL_VERSION", "Vrandan/Comment-Moderation")
+VIDEO_MODEL_VERSION = os.getenv("VIDEO_MODEL_VERSION", "gemini-2.0-flash-exp")
+comment_cache = ModerationCache(execute_with_retry, 'comment', COMMENT_MODEL_VERSION)
+video_cache = ModerationCache(execute_with_retry, 'video', VIDEO_MODEL_VERSION, capacity=1000)
+
+def analyze_comments(texts):
+    """Classify a batch of comments in one forward pass."""
+    inputs = moderation_tokenizer(texts, return_tensors="pt", truncation=True, max_length=512, padding=True)
+    with torch.no_grad():
+        outputs = moderation_model(**inputs)
+    probabilities = outputs.logits.softmax(dim=-1)
+    
+    labels = [moderation_model.config.id2label[i] for i in range(probabilities.shape[-1])]
+    results = []
+    for row in probabilities.tolist():
+        predictions = sorted(zip(labels, row), key=lambda x: x[1], reverse=True)
         top_label, top_prob = predictions[0]
-        
-        return {
+        results.append({
             'status': 'approved' if top_label == 'OK' else 'rejected',
             'label': top_label,
             'confidence': float(top_prob),
             'all_predictions': predictions
-        }
-    except Exception as e:
-        print(f"Error analyzing comment: {e}")
-        return None
-
-def wait_for_files_active(files):
-    print("Waiting for file processing...")
-    for name in (file.name for file in files):
-        file = genai.get_file(name)
-        while file.state.name == "PROCESSING":
-            print(".", end="", flush=True)
-            time.sleep(10)
-            file = genai.get_file(name)
-        if file.state.name != "ACTIVE":
-            raise Exception(f"File {file.name} failed to process")
-    print("...all files ready")
-
-def analyze_video_content(video_data):
-    temp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
-            temp_file.write(video_data)
-            temp_path = temp_file.name
-        
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            print(f"Error: Temporary file {temp_path} is empty or does not exist")
-            return None
+        })
+    return results
 
+def get_comment_verdicts(texts):
+    """
+    Moderation verdicts for a batch of comments. Identical (normalized) texts
+    reuse cached verdicts; the rest are classified together in one pass.
+    Returns a verdict dict, or None where analysis failed, per input text.
+    """
+    keys = [comment_cache.text_key(comment_text) for comment_text in texts]
+    cached = comment_cache.get_many(keys)
+    
+    misses = {}
+    for key, comment_text in zip(keys, texts):
+        if cached[key] is None:
+            misses.setdefault(key, comment_text)
+    
+    if misses:
         try:
-            generation_config = {
-                "temperature": 0,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-                "response_schema": content.Schema(
-                    type=content.Type.OBJECT,
-                    required=["is_safe", "reason"],
-                    properties={
-                        "is_safe": content.Schema(
-                            type=content.Type.BOOLEAN,
-                            description="Whether the video is safe for the platform"
-                        ),
-                        "reason": content.Schema(
-                            type=content.Type.STRING,
-                            description="Explanation of why the video is safe or unsafe"
-                        ),
-                    },
-                ),
-                "response_mime_type": "application/json",
+            analyses = analyze_comments(list(misses.values()))
+        except Exception as e:
+            print(f"Error analyzing comments: {e}")
+            analyses = [None] * len(misses)
+        
+        for key, analysis in zip(misses, analyses):
+            if analysis is None:
+                continue
+            top_label, confidence = analysis['all_predictions'][0]
+            verdict = {
+                'status': analysis['status'],
+                'labels': json.dumps({label: float(prob) for label, prob in analysis['all_predictions']}),
+                'score': float(analysis['confidence']),
+                'reason': f"Comment classified as {top_label} with {float(confidence):.2%} confidence"
             }
+            comment_cache.put(key, verdict, wait=False)
+            cached[key] = verdict
+    
+    return [cached[key] for key in keys]
 
-            model = genai.GenerativeModel(
-                model_name="gemini-2.0-flash-exp",
-                generation_config=generation_config,
-                system_instruction="""Analyze the video for safety and appropriateness. Check for:
-                1. Explicit adult content or nudity
-                2. Graphic violence or gore
-                3. Hate speech or extremist content
-                4. Dangerous or illegal activities
-                5. Harassment or bullying
-                6. Self-harm or suicide content
-                7. Child exploitation
-                8. Misleading or harmful misinformation
-
-                Respond with whether the video is safe for a general audience platform.
-                A video should be marked unsafe if it contains any of the above content."""
-            )
+def get_video_moderation_pipeline():
+    global _video_client
+    if _video_client is None:
+        _video_client = GeminiClient(model_name=VIDEO_MODEL_VERSION)
+    return VideoModerationPipeline(
+        _video_client,
+        concurrency=VIDEO_MODERATION_CONCURRENCY,
+        requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+        mode=VIDEO_MODERATION_MODE,
+        keyframe_budget=KEYFRAME_BUDGET,
+        keyframe_strategy=KEYFRAME_STRATEGY,
+        keyframe_min_seconds=KEYFRAME_MIN_SECONDS
+    )
 
-            max_retries = 3
-            retry_delay = 2
-            last_error = None
-            
-            for attempt in range(max_retries):
-                try:
-                    video_file = genai.upload_file(temp_path, mime_type="video/mp4")
-                    
-                    wait_for_files_active([video_file])
-                    
-                    chat = model.start_chat(history=[{"role": "user", "parts": [video_file]}])
-                    response = chat.send_message("Is this video safe and appropriate for our platform? Analyze it thoroughly.")
-                    
-                    try:
-                        result = json.loads(response.text)
-                        return {
-                            'status': 'approved' if result['is_safe'] else 'rejected',
-                            'reason': result['reason']
-                        }
-                    except json.JSONDecodeError:
-                        print(f"Error parsing Gemini response: {response.text}")
-                        last_error = "Failed to parse Gemini response"
-                        continue
-                        
-                except Exception as e:
-                    print(f"Attempt {attempt + 1} failed: {str(e)}")
-                    last_error = str(e)
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                    continue
-            
-            print(f"All retry attempts failed. Last error: {last_error}")
-            return None
+def write_video_to_temp_file(video_id):
+    """Fetch a single video's blob and spill it to disk so it isn't held in memory during analysis."""
+    result = execute_with_retry(
+        "SELECT video_data FROM videos WHERE video_id = :video_id",
+        {'video_id': video_id}
+    )
+    row = result.first()
+    if row is None or row.video_data is None:
+        return None
+    
+    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
+        temp_file.write(row.video_data)
+        return temp_file.name
 
-        except Exception as e:
-            print(f"Error in Gemini analysis: {e}")
-            return None
+def pending_filter(id_column, content_ids, binary=False):
+    """
+    Build a WHERE fragment and params restricting a pending scan to specific IDs.
+    With `binary`, the column holds BINARY(16) UUIDs and `content_ids` are their string form.
+    """
+    if content_ids is None:
+        return "", {}
+    params = {f"id_{i}": content_id for i, content_id in enumerate(content_ids)}
+    placeholder = "UUID_TO_BIN(:{})" if binary else ":{}"
+    placeholders = ", ".join(placeholder.format(name) for name in params)
+    return f" AND {id_column} IN ({placeholders})", params
 
-    except Exception as e:
-        print(f"Error preparing video for analysis: {e}")
-        return None
+async def moderate_video(pipeline, video):
+    print(f"[{datetime.now()}] Processing video {video.video_id}: {video.title}")
+    
+    temp_path = None
+    try:
+        try:
+            temp_path = await asyncio.to_thread(write_video_to_temp_file, video.video_id)
+        except Exception as e:
+            print(f"[{datetime.now()}] Failed to fetch video data for {video.video_id}: {e}")
+            return
+        
+        if temp_path is None:
+            print(f"[{datetime.now()}] No video data found for {video.video_id}, skipping...")
+            return
+            
+        # Re-uploads of identical bytes reuse the earlier verdict without a Gemini call
+        cache_key = video_cache.digest_key(await asyncio.to_thread(file_sha256, temp_path))
+        analysis = await asyncio.to_thread(video_cache.get, cache_key)
+        
+        if analysis is not None:
+            print(f"[{datetime.now()}] Video {video.video_id} matches a previously moderated upload")
+        else:
+            analysis = await pipeline.analyze(temp_path)
+            
+            if analysis is None:
+                print(f"[{datetime.now()}] Failed to analyze video {video.video_id}, skipping...")
+                return
+            
+            metrics = analysis['metrics']
+            print(
+                f"[{datetime.now()}] Video {video.video_id} analyzed in {metrics['seconds']:.1f}s "
+                f"mode={metrics['mode']} uploaded={metrics['bytes_uploaded']} of {metrics['video_bytes']} bytes"
+            )
+            await asyncio.to_thread(video_cache.put, cache_key, {
+                'status': analysis['status'],
+                'reason': analysis['reason']
+            })
+            
+        update_query = """
+            UPDATE videos
+            SET 
+                moderation_status = :status,
+                moderation_reason = :reason
+            WHERE video_id = :video_id
+        """
+        
+        update_data = {
+            'status': analysis['status'],
+            'reason': analysis['reason'],
+            'video_id': video.video_id
+        }
         
+        try:
+            await asyncio.to_thread(execute_with_retry, update_query, update_data)
+            print(f"[{datetime.now()}] Moderated video {video.video_id} - {video.title}: {analysis['status']}")
+            print(f"[{datetime.now()}] Reason: {analysis['reason']}")
+        except Exception as e:
+            print(f"[{datetime.now()}] Failed to update video {video.video_id}: {e}")
     finally:
         if temp_path and os.path.exists(temp_path):
             try:
@@ -210,18 +342,16 @@ def analyze_video_content(video_data):
             except Exception as e:
                 print(f"Error removing temporary file: {e}")
 
-def moderate_pending_videos():
+def moderate_pending_videos(video_ids=None):
     try:
         print(f"\n[{datetime.now()}] Starting video moderation...")
         
-        query = """
-            SELECT video_id, video_data, title, description
-            FROM videos
-            WHERE moderation_status = 'pending'
-        """
+        # Only metadata here; each worker fetches its own blob when it gets to it
+        id_filter, params = pending_filter("video_id", video_ids)
+        query = PENDING_VIDEOS_QUERY.format(id_filter=id_filter)
         
         try:
-            result = execute_with_retry(query)
+            result = execute_with_retry(query, params)
             pending_videos = result.fetchall()
         except Exception as e:
             print(f"[{datetime.now()}] Failed to fetch pending videos: {e}")
@@ -233,58 +363,25 @@ def moderate_pending_videos():
             
         print(f"[{datetime.now()}] Found {len(pending_videos)} pending videos")
         
-        for video in pending_videos:
-            print(f"[{datetime.now()}] Processing video {video.video_id}: {video.title}")
-            
-            if video.video_data is None:
-                print(f"[{datetime.now()}] No video data found for {video.video_id}, skipping...")
-                continue
-                
-            analysis = analyze_video_content(video.video_data)
-            
-            if analysis is None:
-                print(f"[{datetime.now()}] Failed to analyze video {video.video_id}, skipping...")
-                continue
-                
-            update_query = """
-                UPDATE videos
-                SET 
-                    moderation_status = :status,
-                    moderation_reason = :reason
-                WHERE video_id = :video_id
-            """
-            
-            update_data = {
-                'status': analysis['status'],
-                'reason': analysis['reason'],
-                'video_id': video.video_id
-            }
-            
-            try:
-                execute_with_retry(update_query, update_data)
-                print(f"[{datetime.now()}] Moderated video {video.video_id} - {video.title}: {analysis['status']}")
-                print(f"[{datetime.now()}] Reason: {analysis['reason']}")
-            except Exception as e:
-                print(f"[{datetime.now()}] Failed to update video {video.video_id}: {e}")
-                continue
+        # At most VIDEO_MODERATION_CONCURRENCY videos are on disk / in flight at once
+        pipeline = get_video_moderation_pipeline()
+        asyncio.run(pipeline.run(pending_videos, lambda video: moderate_video(pipeline, video)))
+        video_cache.log_stats()
         
         print(f"[{datetime.now()}] Completed video moderation")
         
     except Exception as e:
         print(f"[{datetime.now()}] Error in video moderation: {e}")
 
-def moderate_pending_comments():
+def moderate_pending_comments(comment_ids=None):
     try:
         print(f"\n[{datetime.now()}] Starting comment moderation...")
         
-        query = """
-            SELECT comment_id, content
-            FROM comments
-            WHERE moderation_status = 'pending'
-        """
+        id_filter, params = pending_filter("comment_id", comment_ids, binary=True)
+        query = PENDING_COMMENTS_QUERY.format(id_filter=id_filter)
         
         try:
-            result = execute_with_retry(query)
+            result = execute_with_retry(query, params)
             pending_comments = result.fetchall()
         except Exception as e:
             print(f"[{datetime.now()}] Failed to fetch pending comments: {e}")
@@ -296,10 +393,13 @@ def moderate_pending_comments():
             
         print(f"[{datetime.now()}] Found {len(pending_comments)} pending comments")
         
-        for comment in pending_comments:
-            analysis = analyze_comment(comment.content)
-            
-            if analysis is None:
+        verdicts = []
+        for start in range(0, len(pending_comments), COMMENT_BATCH_SIZE):
+            chunk = pending_comments[start:start + COMMENT_BATCH_SIZE]
+            verdicts.extend(get_comment_verdicts([comment.content for comment in chunk]))
+        
+        for comment, verdict in zip(pending_comments, verdicts):
+            if verdict is None:
                 continue
                 
             update_query = """
@@ -309,107 +409,286 @@ def moderate_pending_comments():
                     moderation_labels = :labels,
                     moderation_score = :score,
                     moderation_reason = :reason
-                WHERE comment_id = :comment_id
+                WHERE comment_id = UUID_TO_BIN(:comment_id) AND moderation_status = 'pending'
             """
             
-            labels_json = json.dumps({label: float(prob) for label, prob in analysis['all_predictions']})
-            
-            top_label = analysis['all_predictions'][0][0]
-            confidence = analysis['all_predictions'][0][1]
-            reason = f"Comment classified as {top_label} with {confidence:.2%} confidence"
-            
             update_data = {
-                'status': analysis['status'],
-                'labels': labels_json,
-                'score': float(analysis['confidence']),
-                'reason': reason,
+                'status': verdict['status'],
+                'labels': verdict['labels'],
+                'score': verdict['score'],
+                'reason': verdict['reason'],
                 'comment_id': comment.comment_id
             }
             
             try:
-                execute_with_retry(update_query, update_data)
-                print(f"[{datetime.now()}] Moderated comment {comment.comment_id}: {analysis['status']} ({top_label} - {confidence:.4f})")
+                result = execute_with_retry(update_query, update_data)
+                # The sweep and the event worker can race on one comment; only the one that moved it counts it.
+                # Bumping comments_version makes the API drop its cached first page of this video's comments.
+                if result.rowcount:
+                    counted = ", comment_count = comment_count + 1" if verdict['status'] == 'approved' else ""
+                    execute_with_retry(
+                        f"UPDATE videos SET comments_version = comments_version + 1{counted} WHERE video_id = :video_id",
+                        {'video_id': comment.video_id}
+                    )
+                print(f"[{datetime.now()}] Moderated comment {comment.comment_id}: {verdict['status']} ({verdict['reason']})")
             except Exception as e:
                 print(f"[{datetime.now()}] Failed to update comment {comment.comment_id}: {e}")
                 continue
         
+        comment_cache.log_stats()
         print(f"[{datetime.now()}] Completed comment moderation")
         
     except Exception as e:
         print(f"[{datetime.now()}] Error in comment moderation: {e}")
 
+def fold_counter_shards():
+    """Move hot-video counter increments from video_counter_shards into the videos row."""
+    try:
+        shards = execute_with_retry(
+            "SELECT video_id, counter, shard, value FROM video_counter_shards WHERE value <> 0"
+        ).fetchall()
+        if not shards:
+            return
+        
+        totals = {}
+        for row in shards:
+            totals[(row.video_id, row.counter)] = totals.get((row.video_id, row.counter), 0) + row.value
+        
+        with get_db_connection().begin() as connection:
+            for (video_id, counter), value in totals.items():
+                column = VIDEO_COUNTER_COLUMNS[counter]
+                connection.execute(
+                    text(f"UPDATE videos SET {column} = GREATEST({column} + :value, 0) WHERE video_id = :video_id"),
+                    {'video_id': video_id, 'value': value}
+                )
+            # Subtract what was folded instead of zeroing, so increments that landed meanwhile are kept
+            connection.execute(
+                text("""
+                    UPDATE video_counter_shards SET value = value - :value
+                    WHERE video_id = :video_id AND counter = :counter AND shard = :shard
+                """),
+                [
+                    {'video_id': row.video_id, 'counter': row.counter, 'shard': row.shard, 'value': row.value}
+                    for row in shards
+                ]
+            )
+            connection.execute(text("DELETE FROM video_counter_shards WHERE value = 0"))
+        
+        print(f"[{datetime.now()}] Folded {len(shards)} counter shards into {len(totals)} video counters")
+        
+    except Exception as e:
+        print(f"[{datetime.now()}] Error folding counter shards: {e}")
+
+def reconcile_video_counters():
+    """
+    Recount likes, approved comments and views from their source tables.
+    
+    The counters are only ever changed incrementally, so this corrects any
+    drift, such as views counted twice when a write-behind segment is
+    replayed. Unfolded shard values are subtracted so reads still add up.
+    """
+    try:
+        print(f"\n[{datetime.now()}] Reconciling video counters...")
+        query = f"""
+            UPDATE videos v
+            LEFT JOIN (
+                SELECT video_id, COUNT(*) as likes FROM likes GROUP BY video_id
+            ) l ON l.video_id = v.video_id
+            LEFT JOIN (
+                SELECT video_id, COUNT(*) as comments FROM comments
+                WHERE is_active = true AND moderation_status = 'approved'
+                GROUP BY video_id
+            ) c ON c.video_id = v.video_id
+            LEFT JOIN ({VIDEO_VIEWS_QUERY}) i ON i.video_id = v.video_id
+            LEFT JOIN (
+                SELECT
+                    video_id,
+                    SUM(CASE WHEN counter = 'likes' THEN value ELSE 0 END) as likes,
+                    SUM(CASE WHEN counter = 'comments' THEN value ELSE 0 END) as comments,
+                    SUM(CASE WHEN counter = 'views' THEN value ELSE 0 END) as views
+                FROM video_counter_shards
+                GROUP BY video_id
+            ) s ON s.video_id = v.video_id
+            SET
+                v.like_count = COALESCE(l.likes, 0) - COALESCE(s.likes, 0),
+                v.comment_count = COALESCE(c.comments, 0) - COALESCE(s.comments, 0),
+                v.view_count = COALESCE(i.views, 0) - COALESCE(s.views, 0)
+        """
+        result = execute_with_retry(query)
+        print(f"[{datetime.now()}] Reconciled counters, {result.rowcount} videos corrected")
+        
+    except Exception as e:
+        print(f"[{datetime.now()}] Error reconciling video counters: {e}")
+
+def get_interaction_partitions():
+    result = execute_with_retry("""
+        SELECT PARTITION_NAME AS name
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_video_interactions'
+        AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    return [row.name for row in result.fetchall()]
+
+def archive_interaction_partition(name, month):
+    """Archive one month partition: raw rows to Parquet, per-video totals to video_interaction_monthly, then drop it."""
+    path = archive_path(INTERACTION_ARCHIVE_DIR, month)
+    engine = get_db_connection()
+    with engine.connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql(text(f"""
+            SELECT BIN_TO_UUID(interaction_id) AS interaction_id, user_id, video_id, interaction_type, interaction_timestamp, watch_duration
+            FROM user_video_interactions PARTITION ({name})
+        """), conn, chunksize=ARCHIVE_CHUNK_ROWS)
+        archived = write_parquet(chunks, path)
+    
+    # Upserted whole, so rerunning after a failure below is harmless
+    execute_with_retry(f"""
+        INSERT INTO video_interaction_monthly (video_id, month, views, likes, comments, shares)
+        SELECT
+            video_id, :month,
+            SUM(interaction_type = 'view'), SUM(interaction_type = 'like'),
+            SUM(interaction_type = 'comment'), SUM(interaction_type = 'share')
+        FROM user_video_interactions PARTITION ({name})
+        GROUP BY video_id
+        ON DUPLICATE KEY UPDATE
+            views = VALUES(views), likes = VALUES(likes),
+            comments = VALUES(comments), shares = VALUES(shares)
+    """, {'month': month})
+    
+    execute_with_retry(f"ALTER TABLE user_video_interactions DROP PARTITION {name}")
+    print(f"[{datetime.now()}] Archived {archived} interactions from {month:%Y-%m} to {path} and dropped {name}")
+
+def archive_old_interactions():
+    """
+    Keep user_video_interactions to INTERACTION_RETENTION_MONTHS of monthly partitions.
+
+    Partitions for the next INTERACTION_PARTITIONS_AHEAD months are created
+    first, so new rows never pile up in p_future. Every older month is then
+    archived and dropped, oldest first, but only once the category rollup
+    has read past it.
+    """
+    try:
+        print(f"\n[{datetime.now()}] Starting interaction retention...")
+        partitions = get_interaction_partitions()
+        if not partitions:
+            print(f"[{datetime.now()}] user_video_interactions is not partitioned; run `alembic upgrade head` in backend/")
+            return
+        
+        this_month = month_start(datetime.now())
+        months = [month for month in map(partition_month, partitions) if month]
+        upcoming = [add_months(this_month, i) for i in range(INTERACTION_PARTITIONS_AHEAD + 1)]
+        missing = [month for month in upcoming if not months or month > max(months)]
+        if missing:
+            definitions = partition_definitions(missing) + [f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE"]
+            execute_with_retry(
+                f"ALTER TABLE user_video_interactions REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+            )
+            print(f"[{datetime.now()}] Added interaction partitions through {missing[-1]:%Y-%m}")
+        
+        cutoff = add_months(this_month, -INTERACTION_RETENTION_MONTHS)
+        rollup_watermark = get_job_state('user_category_daily').get('watermark')
+        os.makedirs(INTERACTION_ARCHIVE_DIR, exist_ok=True)
+        for name, month in zip(partitions, map(partition_month, partitions)):
+            if month is None or month >= cutoff:
+                continue
+            if rollup_watermark is None or datetime.fromisoformat(rollup_watermark) < month_end(month):
+                print(f"[{datetime.now()}] Category rollup has not covered {month:%Y-%m} yet; keeping {name}")
+                break
+            archive_interaction_partition(name, month)
+        
+        print(f"[{datetime.now()}] Completed interaction retention")
+        
+    except Exception as e:
+        print(f"[{datetime.now()}] Error in interaction retention: {e}")
+
 def load_video_data_from_mysql():
     try:
-        query = """
+        query = f"""
             SELECT 
                 v.video_id,
                 v.user_id,
                 v.title,
-                v.category,
-                COALESCE(COUNT(DISTINCT l.like_id), 0) as likes,
-                COALESCE(COUNT(DISTINCT c.comment_id), 0) as comments,
-                COALESCE(COUNT(DISTINCT i.interaction_id), 0) as views
+                COALESCE(vc.categories, v.category) as category,
+                COALESCE(l.likes, 0) as likes,
+                COALESCE(c.comments, 0) as comments,
+                COALESCE(i.views, 0) as views
             FROM videos v
-            LEFT JOIN likes l ON v.video_id = l.video_id
-            LEFT JOIN comments c ON v.video_id = c.video_id
-            LEFT JOIN user_video_interactions i ON v.video_id = i.video_id AND i.interaction_type = 'view'
+            LEFT JOIN ({VIDEO_CATEGORIES_QUERY}) vc ON v.video_id = vc.video_id
+            -- Count each engagement table on its own; joining them all before grouping
+            -- multiplies likes x comments x views rows per video
+            LEFT JOIN (
+                SELECT video_id, COUNT(*) as likes FROM likes GROUP BY video_id
+            ) l ON v.video_id = l.video_id
+            -- Approved comments only, as videos.comment_count counts them for model updates
+            LEFT JOIN (
+                SELECT video_id, COUNT(*) as comments FROM comments
+                WHERE is_active = true AND moderation_status = 'approved'
+                GROUP BY video_id
+            ) c ON v.video_id = c.video_id
+            LEFT JOIN ({VIDEO_VIEWS_QUERY}) i ON v.video_id = i.video_id
             WHERE v.moderation_status != 'rejected'
-            GROUP BY v.video_id, v.user_id, v.title, v.category
         """
         
+        # Server-side cursor: rows are streamed and compacted chunk by chunk
+        # instead of materializing the whole catalog as object columns
         engine = get_db_connection()
-        df = pd.read_sql(query, engine)
-        return df
+        with engine.connect().execution_options(stream_results=True) as conn:
+            chunks = pd.read_sql(text(query), conn, chunksize=TRAINING_CHUNK_ROWS)
+            return concat_compact(compact_chunk(chunk) for chunk in chunks)
         
     except Exception as e:
         print(f"Error loading video data: {e}")
         return None
 
+def publish_model(model_data):
+    """Write a new model version. The API always loads the newest file, so this is the switch-over."""
+    model_dir = Path(__file__).parent.parent / 'backend' / 'model'
+    model_dir.mkdir(parents=True, exist_ok=True)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    model_path = model_dir / f'recommendation_model_{timestamp}.pkl'
+    model_data['version'] = timestamp
+    
+    # Write under a name the API ignores, then rename so it never loads a half-written file
+    temp_path = model_path.with_suffix('.tmp')
+    with open(temp_path, 'wb') as f:
+        pickle.dump(model_data, f)
+    os.replace(temp_path, model_path)
+    return model_path
+
 def train_recommendation_model():
+    global _model_data
     try:
         print(f"\n[{datetime.now()}] Starting daily model training...")
+        # Stamped before the load: videos changed while it runs are read again by the next update
+        counts_as_of = database_now()
         
-        # Load video data
-        df = load_video_data_from_mysql()
-        if df is None or df.empty:
-            print("No video data available for training")
-            return None
-            
-        # Create TF-IDF matrix from categories
-        vectorizer = TfidfVectorizer()
-        category_matrix = vectorizer.fit_transform(df['category'])
-        
-        # Compute similarity matrix
-        similarity_matrix = cosine_similarity(category_matrix)
-        
-        # Calculate engagement scores
-        df['engagement_score'] = (
-            df['likes'] * 1.0 +
-            df['comments'] * 2.0 +
-            df['views'] * 0.5
-        )
-        
-        # Normalize scores
-        df['engagement_score'] = (df['engagement_score'] - df['engagement_score'].min()) / (df['engagement_score'].max() - df['engagement_score'].min())
-        
-        # Save the model artifacts
-        model_data = {
-            'vectorizer': vectorizer,
-            'similarity_matrix': similarity_matrix,
-            'video_data': df,
-            'trained_at': datetime.now()
-        }
+        def build():
+            df = load_video_data_from_mysql()
+            if df is None or df.empty:
+                return None
+            return build_recommendation_model(df)
         
-        model_dir = Path(__file__).parent.parent / 'backend' / 'model'
-        model_dir.mkdir(parents=True, exist_ok=True)
+        if TRAINING_MEMORY_REPORT:
+            model_data, peak = trace_peak_memory(build)
+        else:
+            model_data, peak = build(), None
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        model_path = model_dir / f'recommendation_model_{timestamp}.pkl'
+        if model_data is None:
+            print("No video data available for training")
+            return None
         
-        with open(model_path, 'wb') as f:
-            pickle.dump(model_data, f)
+        model_data['counts_as_of'] = counts_as_of
+        model_path = publish_model(model_data)
+        _model_data = model_data
         
         print(f"[{datetime.now()}] Successfully trained and saved new model: {model_path}")
+        if peak is not None:
+            artifact_size = model_path.stat().st_size
+            print(
+                f"[{datetime.now()}] Training memory: peak={peak / 1024 / 1024:.1f}MB, "
+                f"artifact={artifact_size / 1024 / 1024:.1f}MB ({peak / max(artifact_size, 1):.1f}x)"
+            )
             
         return model_data
         
@@ -417,59 +696,67 @@ def train_recommendation_model():
         print(f"[{datetime.now()}] Error training model: {e}")
         return None
 
-def analyze_user_preferences():
+def database_now():
+    # The model update compares against videos.updated_at, so its watermarks use the database clock
+    return execute_with_retry("SELECT NOW() AS now").first().now
+
+def load_latest_model():
+    model_dir = Path(__file__).parent.parent / 'backend' / 'model'
+    model_files = list(model_dir.glob('recommendation_model_*.pkl'))
+    if not model_files:
+        return None
+    with open(max(model_files, key=lambda f: f.stat().st_mtime), 'rb') as f:
+        return pickle.load(f)
+
+def update_recommendation_model():
+    """
+    Bring the current model up to date between nightly retrains.
+
+    Only videos whose row changed since the last update are read, through
+    the videos.updated_at index. Their counters (kept current by the API,
+    unlikes included) replace the model's counts, and newly approved videos
+    are appended. The vectorizer and existing similarities are reused as-is.
+    Reading absolute counts makes re-reading a video harmless, so the window
+    overlaps the previous one by MODEL_UPDATE_OVERLAP_SECONDS to catch rows
+    whose transaction committed after that run read.
+    """
+    global _model_data
     try:
-        print(f"\n[{datetime.now()}] Starting user preference analysis...")
-        
-        # Get users with interactions in the last 30 days, broken down by category
-        query = """
-            WITH user_stats AS (
-                SELECT 
-                    u.user_id,
-                    u.username,
-                    v.category,
-                    COUNT(DISTINCT CASE WHEN i.interaction_type = 'view' THEN i.interaction_id END) as total_views,
-                    COUNT(DISTINCT CASE WHEN i.interaction_type = 'like' THEN i.interaction_id END) as total_likes,
-                    COUNT(DISTINCT c.comment_id) as total_comments
-                FROM users u
-                INNER JOIN user_video_interactions i ON u.user_id = i.user_id
-                INNER JOIN videos v ON i.video_id = v.video_id
-                LEFT JOIN comments c ON v.video_id = c.video_id AND c.user_id = u.user_id
-                WHERE i.interaction_timestamp >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-                GROUP BY u.user_id, u.username, v.category
-            )
-            SELECT *
-            FROM user_stats
-            WHERE total_views > 0 OR total_likes > 0 OR total_comments > 0
-            ORDER BY 
-                user_id,
-                (total_views + total_likes + total_comments) DESC
-        """
+        started = time.perf_counter()
+        model_data = _model_data or load_latest_model()
+        if model_data is None or 'category_index' not in model_data:
+            # No model yet, or one in an older format that the next full training replaces
+            return
         
-        result = execute_with_retry(query)
-        all_interactions = result.fetchall()
+        since = model_data['counts_as_of'] - timedelta(seconds=MODEL_UPDATE_OVERLAP_SECONDS)
+        until = database_now()
+        changed = pd.read_sql(text(CHANGED_VIDEOS_QUERY), get_db_connection(), params={'since': since})
+        model_data['counts_as_of'] = until
+        _model_data = model_data
+        if changed.empty:
+            return
         
-        if not all_interactions:
-            print(f"[{datetime.now()}] No users with recent interactions found")
+        refreshed = set_engagement_counts(model_data, changed)
+        added = append_videos(model_data, compact_chunk(changed))
+        if not refreshed and not added:
             return
-            
-        # Group interactions by user
-        users = {}
-        for interaction in all_interactions:
-            if interaction.user_id not in users:
-                users[interaction.user_id] = {
-                    'username': interaction.username,
-                    'categories': []
-                }
-            users[interaction.user_id]['categories'].append({
-                'category': interaction.category,
-                'views': interaction.total_views,
-                'likes': interaction.total_likes,
-                'comments': interaction.total_comments
-            })
-            
-        print(f"[{datetime.now()}] Found {len(users)} users to analyze")
         
+        model_path = publish_model(model_data)
+        print(
+            f"[{datetime.now()}] Updated model {model_path.name}: {added} videos added, "
+            f"{refreshed} engagement counts refreshed, {time.perf_counter() - started:.1f}s"
+        )
+    
+    except Exception as e:
+        print(f"[{datetime.now()}] Error updating model: {e}")
+
+def rerank_preferences_with_llm(candidates):
+    """
+    Ask Gemini to pick 1-3 categories from a user's top local candidates.
+    `candidates` is a list of (category, score). Returns a list, or None to keep the local pick.
+    """
+    global _preference_model
+    if _preference_model is None:
         generation_config = {
             "temperature": 0,
             "top_p": 0.95,
@@ -489,104 +776,296 @@ def analyze_user_preferences():
             ),
             "response_mime_type": "application/json",
         }
-
-        model = genai.GenerativeModel(
+        _preference_model = genai.GenerativeModel(
             model_name="gemini-2.0-flash-exp",
             generation_config=generation_config,
             system_instruction="""You are a content recommendation system. Your task is to analyze user interaction data and suggest relevant content categories.
             
             Rules:
             1. Return EXACTLY 1-3 categories based on relevance
-            2. Consider higher weight for categories with more likes and comments
-            3. Look for categories with consistent engagement across all metrics
-            4. Consider recent viewing patterns
-            5. Choose ONLY from the provided category list"""
+            2. Higher affinity scores mean more (and more recent) likes, comments and views
+            3. Look for categories with consistent engagement
+            4. Choose ONLY from the provided category list"""
         )
+    
+    candidate_names = [category for category, _ in candidates]
+    prompt = f"""Based on this user's engagement, suggest up to 3 most relevant content categories from the following list:
 
-        for user_id, user_data in users.items():
-            try:
-                category_stats = []
-                for cat in user_data['categories']:
-                    category_stats.append(
-                        f"- {cat['category']}:\n"
-                        f"  * Views: {cat['views']}\n"
-                        f"  * Likes: {cat['likes']}\n"
-                        f"  * Comments: {cat['comments']}"
-                    )
+{chr(10).join(candidate_names)}
 
-                prompt = f"""Based on this user's detailed interaction data, suggest up to 3 most relevant content categories from the following list:
-
-Entertainment & Pop Culture
-Sports & Fitness
-Music & Performance Arts
-Technology & Gadgets
-Education & How-To
-News & Current Affairs
-Health & Wellness
-Food & Cooking
-Travel & Exploration
-Gaming & Esports
-Science & Nature
-Finance & Business
-Lifestyle & Fashion
-Movies & TV Shows
-Motivation & Personal Development
-Comedy & Fun
-Automobiles & Vehicles
-Home & DIY
-Pets & Animals
-
-User Interaction Data by Category:
-{chr(10).join(category_stats)}"""
-
-                response = model.generate_content(prompt)
-                
-                try:
-                    if hasattr(response, 'text'):
-                        categories_data = json.loads(response.text)
-                    else:
-                        categories_data = json.loads(str(response))
-                        
-                    if not isinstance(categories_data, dict) or 'categories' not in categories_data:
-                        raise ValueError("Invalid response format")
-                        
-                    categories = categories_data['categories']
-                    
-                    if not isinstance(categories, list) or not categories:
-                        raise ValueError("No valid categories returned")
-                    
-                    update_query = """
-                        UPDATE users 
-                        SET preferences = :preferences
-                        WHERE user_id = :user_id
-                    """
-                    
-                    preferences_json = json.dumps({
-                        "categories": categories,
-                        "updated_at": datetime.now().isoformat()
-                    })
-                    
-                    execute_with_retry(update_query, {
-                        'preferences': preferences_json,
-                        'user_id': user_id
-                    })
-                    
-                    print(f"[{datetime.now()}] Updated preferences for {user_data['username']}: {categories}")
-                    
-                except json.JSONDecodeError as e:
-                    print(f"[{datetime.now()}] Error parsing Gemini response for user {user_data['username']}: {e}")
-                    print(f"Raw response: {response.text if hasattr(response, 'text') else response}")
-                    continue
-                    
-                except ValueError as e:
-                    print(f"[{datetime.now()}] Invalid response format for user {user_data['username']}: {e}")
-                    continue
-                
-            except Exception as e:
-                print(f"[{datetime.now()}] Error analyzing preferences for user {user_data['username']}: {e}")
+Affinity score by category:
+{chr(10).join(f"- {category}: {score:.2f}" for category, score in candidates)}"""
+    
+    try:
+        response = _preference_model.generate_content(prompt)
+        categories = json.loads(response.text)['categories']
+        categories = [category for category in categories if category in candidate_names][:3]
+        return categories or None
+    except Exception as e:
+        print(f"[{datetime.now()}] Preference rerank failed, keeping local pick: {e}")
+        return None
+
+def get_job_state(job_name):
+    row = execute_with_retry(
+        "SELECT state FROM job_state WHERE job_name = :job_name",
+        {'job_name': job_name}
+    ).first()
+    if row is None or row.state is None:
+        return {}
+    return json.loads(row.state) if isinstance(row.state, (str, bytes)) else row.state
+
+def set_job_state(job_name, state):
+    execute_with_retry(
+        """
+        INSERT INTO job_state (job_name, state) VALUES (:job_name, :state)
+        ON DUPLICATE KEY UPDATE state = VALUES(state)
+        """,
+        {'job_name': job_name, 'state': json.dumps(state)}
+    )
+
+def refresh_category_rollup():
+    """
+    Add interactions since the last refresh into `user_category_daily`.
+
+    Only interactions older than PREFERENCE_WATERMARK_OVERLAP_MINUTES are
+    rolled up, since write-behind flushes can still commit rows behind the
+    newest timestamp. Each slice between the watermark and that cutoff is
+    aggregated once, added to the existing day rows, and the watermark is
+    moved in the same transaction, so a slice is never counted twice. The
+    first run backfills PREFERENCE_WINDOW_DAYS. Rows committed after the
+    watermark passed their timestamp are picked up by the nightly
+    `rebuild_category_rollup`.
+    """
+    try:
+        started = time.perf_counter()
+        state = get_job_state('user_category_daily')
+        until = datetime.now() - timedelta(minutes=PREFERENCE_WATERMARK_OVERLAP_MINUTES)
+        if state.get('watermark'):
+            since = datetime.fromisoformat(state['watermark'])
+        else:
+            since = datetime.combine((datetime.now() - timedelta(days=PREFERENCE_WINDOW_DAYS)).date(), datetime.min.time())
+        if until <= since:
+            return
+        
+        count_query = text(ROLLUP_COUNTS_QUERY)
+        upsert_query = text(ROLLUP_UPSERT_QUERY)
+        watermark_query = text("""
+            INSERT INTO job_state (job_name, state) VALUES ('user_category_daily', :state)
+            ON DUPLICATE KEY UPDATE state = VALUES(state)
+        """)
+        
+        # Slices never cross midnight, so a backfill holds at most one day of activity in memory
+        engine = get_db_connection()
+        slice_start = since
+        rows_written = 0
+        while slice_start < until:
+            slice_end = min(until, datetime.combine(slice_start.date() + timedelta(days=1), datetime.min.time()))
+            counts = pd.read_sql(count_query, engine, params={'slice_start': slice_start, 'slice_end': slice_end})
+            rows = build_daily_rollup(counts).to_dict(orient='records')
+            with engine.begin() as connection:
+                for start in range(0, len(rows), PREFERENCE_WRITE_BATCH):
+                    connection.execute(upsert_query, rows[start:start + PREFERENCE_WRITE_BATCH])
+                connection.execute(watermark_query, {'state': json.dumps({'watermark': slice_end.isoformat()})})
+            rows_written += len(rows)
+            slice_start = slice_end
+        
+        execute_with_retry(
+            "DELETE FROM user_category_daily WHERE day < :cutoff",
+            {'cutoff': (datetime.now() - timedelta(days=ROLLUP_RETENTION_DAYS)).date()}
+        )
+        print(
+            f"[{datetime.now()}] Refreshed category rollup from {since} to {until}: "
+            f"{rows_written} rows, {time.perf_counter() - started:.1f}s"
+        )
+    
+    except Exception as e:
+        print(f"[{datetime.now()}] Error refreshing category rollup: {e}")
+
+def rebuild_category_rollup():
+    """
+    Recount the last PREFERENCE_WINDOW_DAYS of `user_category_daily` from raw interactions.
+
+    The refresh adds each interaction by its timestamp, so one committed
+    after the watermark passed it, such as a write-behind segment replayed
+    after an outage, is never counted. Each day up to the watermark is
+    replaced in its own transaction with every interaction before the
+    watermark, which leaves the rest to the next refresh. Runs in the same
+    single-worker pool as the refresh, so the watermark can't move meanwhile.
+    """
+    try:
+        print(f"\n[{datetime.now()}] Rebuilding category rollup...")
+        started = time.perf_counter()
+        watermark = get_job_state('user_category_daily').get('watermark')
+        if not watermark:
+            return
+        watermark = datetime.fromisoformat(watermark)
+        
+        count_query = text(ROLLUP_COUNTS_QUERY)
+        upsert_query = text(ROLLUP_UPSERT_QUERY)
+        delete_query = text("DELETE FROM user_category_daily WHERE day = :day")
+        
+        engine = get_db_connection()
+        day_start = datetime.combine((datetime.now() - timedelta(days=PREFERENCE_WINDOW_DAYS)).date(), datetime.min.time())
+        rows_written = 0
+        while day_start < watermark:
+            day_end = min(watermark, day_start + timedelta(days=1))
+            counts = pd.read_sql(count_query, engine, params={'slice_start': day_start, 'slice_end': day_end})
+            rows = build_daily_rollup(counts).to_dict(orient='records')
+            with engine.begin() as connection:
+                connection.execute(delete_query, {'day': day_start.date()})
+                for start in range(0, len(rows), PREFERENCE_WRITE_BATCH):
+                    connection.execute(upsert_query, rows[start:start + PREFERENCE_WRITE_BATCH])
+            rows_written += len(rows)
+            day_start = day_end
+        
+        print(
+            f"[{datetime.now()}] Rebuilt category rollup up to {watermark}: "
+            f"{rows_written} rows, {time.perf_counter() - started:.1f}s"
+        )
+    
+    except Exception as e:
+        print(f"[{datetime.now()}] Error rebuilding category rollup: {e}")
+
+def user_id_filter(user_ids):
+    """Build an ` AND user_id IN (...)` fragment and params for one batch of users, or no filter for None."""
+    if user_ids is None:
+        return "", {}
+    params = {f"user_{i}": user_id for i, user_id in enumerate(user_ids)}
+    placeholders = ", ".join(f":{name}" for name in params)
+    return f" AND user_id IN ({placeholders})", params
+
+def score_user_affinity(now, user_ids=None):
+    """Category affinity from the last PREFERENCE_WINDOW_DAYS of the daily rollup, for all users or just `user_ids`."""
+    query = """
+        SELECT user_id, category, day, views, likes, comments, shares
+        FROM user_category_daily
+        WHERE day >= :since{user_filter}
+    """
+    
+    user_batches = [None] if user_ids is None else [
+        user_ids[start:start + PREFERENCE_USER_BATCH]
+        for start in range(0, len(user_ids), PREFERENCE_USER_BATCH)
+    ]
+    
+    engine = get_db_connection()
+    partials = []
+    for batch in user_batches:
+        user_filter, params = user_id_filter(batch)
+        params['since'] = (now - timedelta(days=PREFERENCE_WINDOW_DAYS)).date()
+        for chunk in pd.read_sql(text(query.format(user_filter=user_filter)), engine, params=params, chunksize=PREFERENCE_CHUNK_ROWS):
+            partial = compute_category_affinity(chunk, now, PREFERENCE_HALF_LIFE_DAYS)
+            if not partial.empty:
+                partials.append(partial)
+    
+    if not partials:
+        return None
+    return pd.concat(partials).groupby(['user_id', 'category'], as_index=False)['score'].sum()
+
+def get_current_preferences(user_ids):
+    current = {}
+    for start in range(0, len(user_ids), PREFERENCE_USER_BATCH):
+        user_filter, params = user_id_filter(user_ids[start:start + PREFERENCE_USER_BATCH])
+        rows = execute_with_retry(
+            f"SELECT user_id, preferences FROM users WHERE preferences IS NOT NULL{user_filter}",
+            params
+        ).fetchall()
+        for row in rows:
+            try:
+                preferences = json.loads(row.preferences) if isinstance(row.preferences, (str, bytes)) else row.preferences
+                current[row.user_id] = preferences.get('categories')
+            except (ValueError, AttributeError):
                 continue
+    return current
+
+def analyze_user_preferences():
+    try:
+        print(f"\n[{datetime.now()}] Starting user preference analysis...")
+        started = time.perf_counter()
+        now = datetime.now()
+        refresh_category_rollup()
         
-        print(f"[{datetime.now()}] Completed user preference analysis")
+        # Only users with interactions since the last run are recomputed, with a periodic full refresh
+        state = get_job_state('user_preferences')
+        high_watermark = execute_with_retry("SELECT MAX(interaction_timestamp) AS ts FROM user_video_interactions").first().ts
+        last_full_run = datetime.fromisoformat(state['last_full_run']) if state.get('last_full_run') else None
+        full_run = (
+            not state.get('watermark')
+            or last_full_run is None
+            or now - last_full_run >= timedelta(days=PREFERENCE_FULL_REFRESH_DAYS)
+        )
+        
+        user_ids = None
+        if not full_run:
+            # Overlap a little so late-committed interactions are not skipped
+            since = datetime.fromisoformat(state['watermark']) - timedelta(minutes=PREFERENCE_WATERMARK_OVERLAP_MINUTES)
+            rows = execute_with_retry(
+                "SELECT DISTINCT user_id FROM user_video_interactions WHERE interaction_timestamp > :since",
+                {'since': since}
+            ).fetchall()
+            user_ids = [row.user_id for row in rows]
+            print(f"[{datetime.now()}] Incremental run: {len(user_ids)} users with new interactions since {since}")
+            if not user_ids:
+                print(f"[{datetime.now()}] No new interactions, preferences unchanged")
+                return
+        else:
+            print(f"[{datetime.now()}] Full preference refresh")
+        
+        affinity = score_user_affinity(now, user_ids)
+        
+        if affinity is None:
+            print(f"[{datetime.now()}] No users with recent interactions found")
+            return
+        
+        selected = select_preferred_categories(affinity, min_share=PREFERENCE_MIN_SHARE)
+        print(f"[{datetime.now()}] Scored {len(selected)} users across {len(affinity)} user/category pairs")
+        
+        # The LLM is only consulted for users whose local ranking is a near tie
+        reranked = 0
+        if PREFERENCE_LLM_RERANK:
+            ambiguous_ids = selected.index[selected['ambiguous']][:PREFERENCE_LLM_MAX_USERS]
+            top_candidates = (
+                affinity[affinity['user_id'].isin(ambiguous_ids)]
+                .sort_values('score', ascending=False)
+                .groupby('user_id')
+                .head(5)
+            )
+            for user_id, rows in top_candidates.groupby('user_id'):
+                categories = rerank_preferences_with_llm(list(zip(rows['category'], rows['score'])))
+                if categories:
+                    selected.at[user_id, 'categories'] = categories
+                    reranked += 1
+        
+        update_query = """
+            UPDATE users 
+            SET preferences = :preferences
+            WHERE user_id = :user_id
+        """
+        
+        # Skip the write for users whose categories did not change
+        current = get_current_preferences(list(selected.index))
+        updated_at = now.isoformat()
+        updates = [
+            {
+                'user_id': user_id,
+                'preferences': json.dumps({"categories": categories, "updated_at": updated_at})
+            }
+            for user_id, categories in selected['categories'].items()
+            if current.get(user_id) != categories
+        ]
+        
+        for start in range(0, len(updates), PREFERENCE_WRITE_BATCH):
+            execute_with_retry(update_query, updates[start:start + PREFERENCE_WRITE_BATCH])
+        
+        if high_watermark is not None:
+            set_job_state('user_preferences', {
+                'watermark': high_watermark.isoformat(),
+                'last_full_run': now.isoformat() if full_run else state.get('last_full_run')
+            })
+        
+        print(
+            f"[{datetime.now()}] Completed user preference analysis: {len(updates)} of {len(selected)} users changed, "
+            f"{reranked} reranked by LLM, {time.perf_counter() - started:.1f}s"
+        )
         
     except Exception as e:
         print(f"[{datetime.now()}] Error in user preference analysis: {e}")
@@ -594,28 +1073,84 @@ User Interaction Data by Category:
 def main():
     print(f"[{datetime.now()}] Starting services...")
     
-    # Schedule daily model training at 3 AM
-    schedule.every().day.at("03:00").do(train_recommendation_model)
+    # New comments and videos are pushed to us by the API as they are created
+    comment_queue = PendingQueue(batch_window=0.5, max_batch=64)
+    video_queue = PendingQueue(batch_window=2.0, max_batch=8)
+    stop_event = threading.Event()
+    
+    # Moderation gets its own pool so training and preference analysis can never block it
+    runner = JobRunner()
+    runner.add_pool("moderation", max_workers=2)
+    runner.add_pool("training", max_workers=1)
+    runner.add_pool("analysis", max_workers=1)
+    
+    runner.register("moderate_comments", moderate_pending_comments, "moderation", startup_delay=0, backlog=lambda: len(comment_queue))
+    runner.register("moderate_videos", moderate_pending_videos, "moderation", startup_delay=15, backlog=lambda: len(video_queue))
+    runner.register("train_model", train_recommendation_model, "training", startup_delay=60)
+    runner.register("update_model", update_recommendation_model, "training", startup_delay=90)
+    runner.register("analyze_preferences", analyze_user_preferences, "analysis", startup_delay=300)
+    runner.register("refresh_category_rollup", refresh_category_rollup, "analysis", startup_delay=120)
+    runner.register("rebuild_category_rollup", rebuild_category_rollup, "analysis", startup_delay=1200)
+    runner.register("fold_counter_shards", fold_counter_shards, "analysis", startup_delay=30)
+    runner.register("reconcile_counters", reconcile_video_counters, "analysis", startup_delay=600)
+    runner.register("archive_interactions", archive_old_interactions, "analysis", startup_delay=900)
+    
+    # Warm model behind /moderate so the API can get comment verdicts inline
+    comment_batcher = MicroBatcher(get_comment_verdicts, max_batch=COMMENT_BATCH_SIZE, max_wait=COMMENT_BATCH_WAIT_MS / 1000)
+    comment_batcher.start()
     
-    # Schedule comment moderation every 5 minutes
-    schedule.every(5).minutes.do(moderate_pending_comments)
+    listener = ModerationEventListener(
+        {"comment": comment_queue, "video": video_queue},
+        port=MODERATION_EVENTS_PORT,
+        comment_batcher=comment_batcher
+    )
+    listener.start()
+    start_event_worker("comment-moderation", comment_queue, lambda ids: runner.run_inline("moderate_comments", ids), stop_event)
+    start_event_worker("video-moderation", video_queue, lambda ids: runner.run_inline("moderate_videos", ids), stop_event)
     
-    # Schedule video moderation every 10 minutes
-    schedule.every(10).minutes.do(moderate_pending_videos)
+    # Nightly recount corrects any drift in the incrementally maintained video counters
+    schedule.every().day.at("02:30").do(runner.trigger, "reconcile_counters")
+    schedule.every(COUNTER_FOLD_SECONDS).seconds.do(runner.trigger, "fold_counter_shards")
+    # Monthly partitions: create upcoming ones, archive and drop expired ones
+    schedule.every().day.at("01:30").do(runner.trigger, "archive_interactions")
+    
+    # Schedule daily model training at 3 AM
+    schedule.every().day.at("03:00").do(runner.trigger, "train_model")
+    schedule.every(MODEL_UPDATE_MINUTES).minutes.do(runner.trigger, "update_model")
+    
+    # Slow safety-net sweeps for anything whose notification was lost
+    schedule.every(MODERATION_POLL_MINUTES).minutes.do(runner.trigger, "moderate_comments")
+    schedule.every(MODERATION_POLL_MINUTES).minutes.do(runner.trigger, "moderate_videos")
     
     # Schedule user preference analysis daily at 4 AM
-    schedule.every().day.at("04:00").do(analyze_user_preferences)
+    schedule.every().day.at("04:00").do(runner.trigger, "analyze_preferences")
+    # Keeps online category lookups in the API fresh between preference runs
+    schedule.every(ROLLUP_REFRESH_MINUTES).minutes.do(runner.trigger, "refresh_category_rollup")
+    # Nightly recount picks up interactions that were committed after the refresh passed them
+    schedule.every().day.at("03:30").do(runner.trigger, "rebuild_category_rollup")
+    
+    schedule.every(JOB_STATS_MINUTES).minutes.do(runner.log_stats)
     
-    # Run all tasks immediately on startup
-    train_recommendation_model()
-    moderate_pending_comments()
-    moderate_pending_videos()
-    analyze_user_preferences()
+    # Run every job once on startup, staggered so they don't all compete at once
+    runner.start()
+    
+    shutdown = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: shutdown.set())
     
     # Keep the script running
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    try:
+        while not shutdown.is_set():
+            schedule.run_pending()
+            shutdown.wait(1)
+    finally:
+        print(f"[{datetime.now()}] Shutting down, waiting for running jobs to finish...")
+        stop_event.set()
+        listener.stop()
+        comment_batcher.stop()
+        runner.shutdown(wait=True)
+        runner.log_stats()
+        print(f"[{datetime.now()}] Stopped")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,84 @@
+import os
+from datetime import date, datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# user_video_interactions is range-partitioned by month: p202601 holds January
+# 2026, and p_future catches anything past the last month partition
+FUTURE_PARTITION = 'p_future'
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('interaction_id', pa.string()),
+    ('user_id', pa.string()),
+    ('video_id', pa.string()),
+    ('interaction_type', pa.string()),
+    ('interaction_timestamp', pa.timestamp('us')),
+    ('watch_duration', pa.int32()),
+])
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_end(month):
+    """First moment after `month`, as a datetime."""
+    following = add_months(month, 1)
+    return datetime(following.year, following.month, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name):
+    """The month a partition holds, or None for p_future and anything unrecognized."""
+    if len(name) != 7 or not name.startswith('p') or not name[1:].isdigit():
+        return None
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def partition_definitions(months):
+    return [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{month_end(month):%Y-%m-%d %H:%M:%S}'))"
+        for month in months
+    ]
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"user_video_interactions-{month:%Y-%m}.parquet")
+
+
+def write_parquet(chunks, path, compression='zstd'):
+    """
+    Write DataFrame chunks of raw interactions to one Parquet file.
+
+    The file is written next to `path` and moved into place when complete,
+    so a retried archive run replaces a partial file instead of appending
+    to it. Returns the number of rows written; nothing is written for no rows.
+    """
+    temp_path = path + ".tmp"
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            table = pa.Table.from_pandas(chunk, schema=ARCHIVE_SCHEMA, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(temp_path, ARCHIVE_SCHEMA, compression=compression)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return 0
+    os.replace(temp_path, path)
+    return rows
@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class Job:
+    def __init__(self, name, func, pool, startup_delay=0, backlog=None):
+        self.name = name
+        self.func = func
+        self.pool = pool
+        self.startup_delay = startup_delay
+        self.backlog = backlog
+        self.lock = threading.Lock()
+        self.queued = False
+        self.runs = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_success = None
+        self.last_error = None
+
+
+class JobRunner:
+    """
+    Runs scheduled jobs on a dedicated thread pool per job class, so a long
+    training run can never hold up moderation. Each job has its own lock:
+    a trigger that arrives while the job is still running or queued is
+    coalesced instead of piling up behind it.
+    """
+
+    def __init__(self):
+        self._pools = {}
+        self._jobs = {}
+        self._timers = []
+        self._trigger_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def add_pool(self, name, max_workers=1):
+        self._pools[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-job")
+
+    def register(self, name, func, pool, startup_delay=0, backlog=None):
+        if pool not in self._pools:
+            raise ValueError(f"Unknown executor pool: {pool}")
+        self._jobs[name] = Job(name, func, pool, startup_delay, backlog)
+
+    def _execute(self, job, args):
+        with job.lock:
+            job.queued = False
+            if self._stopping.is_set():
+                return
+            job.last_started = datetime.now()
+            start = time.perf_counter()
+            try:
+                job.func(*args)
+                job.last_success = datetime.now()
+                job.last_error = None
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                print(f"[{datetime.now()}] Job {job.name} failed: {e}")
+            finally:
+                job.runs += 1
+                job.last_duration = time.perf_counter() - start
+
+    def trigger(self, name, *args):
+        """Queue a run on the job's pool. Returns False if a run is already pending."""
+        job = self._jobs[name]
+        with self._trigger_lock:
+            if self._stopping.is_set():
+                return False
+            if job.queued or job.lock.locked():
+                job.coalesced += 1
+                print(f"[{datetime.now()}] Job {name} still running, skipping this trigger")
+                return False
+            job.queued = True
+            self._pools[job.pool].submit(self._execute, job, args)
+        return True
+
+    def run_inline(self, name, *args):
+        """Run in the calling thread, waiting for any in-flight run of the same job to finish first."""
+        self._execute(self._jobs[name], args)
+
+    def start(self):
+        """Kick off each job once, spread out by its startup delay instead of all at once."""
+        for job in self._jobs.values():
+            timer = threading.Timer(job.startup_delay, self.trigger, args=(job.name,))
+            timer.daemon = True
+            timer.start()
+            self._timers.append(timer)
+
+    def stats(self):
+        stats = {}
+        for job in self._jobs.values():
+            backlog = None
+            if job.backlog is not None:
+                try:
+                    backlog = job.backlog()
+                except Exception:
+                    pass
+            stats[job.name] = {
+                'running': job.lock.locked(),
+                'runs': job.runs,
+                'failures': job.failures,
+                'coalesced': job.coalesced,
+                'last_started': job.last_started,
+                'last_duration': job.last_duration,
+                'last_success': job.last_success,
+                'last_error': job.last_error,
+                'backlog': backlog
+            }
+        return stats
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            duration = f"{s['last_duration']:.1f}s" if s['last_duration'] is not None else "-"
+            print(
+                f"[{datetime.now()}] {name}: running={s['running']} runs={s['runs']} "
+                f"failures={s['failures']} coalesced={s['coalesced']} last_duration={duration} "
+                f"last_success={s['last_success'] or '-'} backlog={s['backlog'] if s['backlog'] is not None else '-'}"
+            )
+
+    def shutdown(self, wait=True):
+        """Stop accepting triggers, drop queued runs and wait for in-flight ones to finish."""
+        self._stopping.set()
+        for timer in self._timers:
+            timer.cancel()
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,144 @@
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+def normalize_text(text):
+    """Fold the cosmetic differences spam reposts use to dodge exact matching."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModerationCache:
+    """
+    Verdict cache keyed by content hash and model version.
+
+    A bounded in-memory LRU sits in front of the `moderation_cache` table so
+    repeats within a spam wave never touch the database, and verdicts
+    survive restarts. `execute` is a callable like execute_with_retry.
+    """
+
+    def __init__(self, execute, content_type, model_version, capacity=10000):
+        self.execute = execute
+        self.content_type = content_type
+        self.model_version = model_version
+        self.capacity = capacity
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{content_type}-cache")
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def text_key(self, text):
+        return self._key(normalize_text(text).encode())
+
+    def digest_key(self, digest):
+        return self._key(digest.encode())
+
+    def _key(self, payload):
+        prefix = f"{self.content_type}:{self.model_version}:".encode()
+        return hashlib.sha256(prefix + payload).hexdigest()
+
+    def _remember(self, key, verdict):
+        with self._lock:
+            self._lru[key] = verdict
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key])[key]
+
+    def get_many(self, keys):
+        """Look up several keys at once: memory first, then a single query for the rest."""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                verdict = self._lru.get(key)
+                if verdict is not None:
+                    self._lru.move_to_end(key)
+                    self.memory_hits += 1
+                    found[key] = verdict
+                elif key not in missing:
+                    missing.append(key)
+
+        rows = []
+        if missing:
+            params = {f"key_{i}": key for i, key in enumerate(missing)}
+            placeholders = ", ".join(f":{name}" for name in params)
+            try:
+                rows = self.execute(
+                    f"SELECT cache_key, verdict FROM moderation_cache WHERE cache_key IN ({placeholders})",
+                    params
+                ).fetchall()
+            except Exception as e:
+                print(f"[{datetime.now()}] Moderation cache lookup failed: {e}")
+
+        for row in rows:
+            verdict = json.loads(row.verdict) if isinstance(row.verdict, (str, bytes)) else row.verdict
+            found[row.cache_key] = verdict
+            self._remember(row.cache_key, verdict)
+
+        with self._lock:
+            self.db_hits += len(rows)
+            self.misses += len(missing) - len(rows)
+        return {key: found.get(key) for key in keys}
+
+    def _persist(self, key, verdict):
+        try:
+            self.execute(
+                """
+                INSERT INTO moderation_cache (cache_key, content_type, model_version, verdict)
+                VALUES (:cache_key, :content_type, :model_version, :verdict)
+                ON DUPLICATE KEY UPDATE verdict = VALUES(verdict)
+                """,
+                {
+                    'cache_key': key,
+                    'content_type': self.content_type,
+                    'model_version': self.model_version,
+                    'verdict': json.dumps(verdict)
+                }
+            )
+        except Exception as e:
+            print(f"[{datetime.now()}] Failed to persist moderation verdict: {e}")
+
+    def put(self, key, verdict, wait=True):
+        """Store a verdict. With wait=False the database write happens in the background."""
+        self._remember(key, verdict)
+        if wait:
+            self._persist(key, verdict)
+        else:
+            self._writer.submit(self._persist, key, verdict)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+                'size': len(self._lru)
+            }
+
+    def log_stats(self):
+        s = self.stats()
+        print(
+            f"[{datetime.now()}] {self.content_type} moderation cache: hit_rate={s['hit_rate']:.1%} "
+            f"memory_hits={s['memory_hits']} db_hits={s['db_hits']} misses={s['misses']} size={s['size']}"
+        )
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PendingQueue:
+    """Collects pending content IDs pushed by the API and hands them out in micro-batches."""
+
+    def __init__(self, batch_window=0.5, max_batch=64):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._ids = []
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def put(self, content_id):
+        with self._lock:
+            if content_id in self._queued:
+                return
+            self._queued.add(content_id)
+            self._ids.append(content_id)
+            self._ready.set()
+
+    def get_batch(self, timeout=None):
+        if not self._ready.wait(timeout):
+            return []
+
+        # Give concurrent writers a short window to land in the same batch
+        deadline = time.monotonic() + self.batch_window
+        while time.monotonic() < deadline:
+            with self._lock:
+                if len(self._ids) >= self.max_batch:
+                    break
+            time.sleep(0.05)
+
+        with self._lock:
+            batch = self._ids[:self.max_batch]
+            self._ids = self._ids[self.max_batch:]
+            self._queued.difference_update(batch)
+            if not self._ids:
+                self._ready.clear()
+        return batch
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when many API workers call at once
+    request_queue_size = 128
+
+
+class ModerationEventListener:
+    """
+    Local HTTP endpoint the API talks to.
+
+    POST /events with a JSON body like
+    {"items": [{"type": "comment", "id": "..."}, {"type": "video", "id": "..."}]}
+    routes each ID to the queue registered for its content type.
+
+    POST /moderate with {"text": "..."} returns a comment verdict inline when a
+    `comment_batcher` (MicroBatcher) is configured, or 503 if it can't answer
+    within `moderate_timeout` seconds.
+    """
+
+    def __init__(self, queues, host="127.0.0.1", port=5177, comment_batcher=None, moderate_timeout=2.0):
+        self.queues = queues
+        self.host = host
+        self.port = port
+        self.comment_batcher = comment_batcher
+        self.moderate_timeout = moderate_timeout
+        self._server = None
+        self._thread = None
+
+    def _make_handler(self):
+        queues = self.queues
+        batcher = self.comment_batcher
+        moderate_timeout = self.moderate_timeout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, code, payload=None):
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _moderate(self):
+                if batcher is None:
+                    self._reply(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    text = json.loads(self.rfile.read(length) or b"{}")["text"]
+                except (ValueError, KeyError, TypeError) as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                try:
+                    verdict = batcher.submit(text).result(timeout=moderate_timeout)
+                except FutureTimeoutError:
+                    self._reply(503, {"error": "moderation timed out"})
+                    return
+                except Exception as e:
+                    self._reply(500, {"error": str(e)})
+                    return
+                if verdict is None:
+                    self._reply(503, {"error": "moderation unavailable"})
+                    return
+                self._reply(200, verdict)
+
+            def do_POST(self):
+                if self.path == "/moderate":
+                    self._moderate()
+                    return
+                if self.path != "/events":
+                    self._reply(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    accepted = 0
+                    for item in payload.get("items", []):
+                        queue = queues.get(item.get("type"))
+                        if queue is not None and item.get("id"):
+                            queue.put(item["id"])
+                            accepted += 1
+                    self._reply(202, {"accepted": accepted})
+                except (ValueError, AttributeError) as e:
+                    print(f"[{datetime.now()}] Invalid moderation event: {e}")
+                    self._reply(400, {"error": str(e)})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = _Server((self.host, self.port), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="moderation-events", daemon=True)
+        self._thread.start()
+        print(f"[{datetime.now()}] Listening for moderation events on {self.host}:{self.port}")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def start_event_worker(name, queue, handler, stop_event):
+    """Run `handler(batch)` in a background thread whenever IDs arrive on `queue`."""
+
+    def run():
+        while not stop_event.is_set():
+            batch = queue.get_batch(timeout=1.0)
+            if not batch:
+                continue
+            try:
+                handler(batch)
+            except Exception as e:
+                print(f"[{datetime.now()}] Error in {name} worker: {e}")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
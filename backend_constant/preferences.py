@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+CONTENT_CATEGORIES = [
+    "Entertainment & Pop Culture",
+    "Sports & Fitness",
+    "Music & Performance Arts",
+    "Technology & Gadgets",
+    "Education & How-To",
+    "News & Current Affairs",
+    "Health & Wellness",
+    "Food & Cooking",
+    "Travel & Exploration",
+    "Gaming & Esports",
+    "Science & Nature",
+    "Finance & Business",
+    "Lifestyle & Fashion",
+    "Movies & TV Shows",
+    "Motivation & Personal Development",
+    "Comedy & Fun",
+    "Automobiles & Vehicles",
+    "Home & DIY",
+    "Pets & Animals",
+]
+
+# Same relative weights as the recommender's engagement score
+INTERACTION_WEIGHTS = {
+    'view': 0.5,
+    'like': 1.0,
+    'comment': 2.0,
+    'share': 2.0,
+}
+
+
+def explode_categories(df, column='category'):
+    """Split comma-joined multi-category strings into one row per category."""
+    df = df.assign(**{column: df[column].fillna('').str.split(',')}).explode(column)
+    df[column] = df[column].str.strip()
+    return df[(df[column] != '') & (df[column].str.lower() != 'none')]
+
+
+# Rollup column holding the daily count for each interaction type
+ROLLUP_COLUMNS = {
+    'view': 'views',
+    'like': 'likes',
+    'comment': 'comments',
+    'share': 'shares',
+}
+
+
+def build_daily_rollup(counts):
+    """
+    Turn per-(user_id, category, day, interaction_type) counts into
+    `user_category_daily` rows.
+
+    `counts` comes straight from a GROUP BY over interactions joined to
+    videos, so `category` may still be a comma-joined multi-category
+    string. Returns one row per (user_id, category, day) with a count
+    column per interaction type.
+    """
+    columns = ['user_id', 'category', 'day'] + list(ROLLUP_COLUMNS.values())
+    if counts.empty:
+        return pd.DataFrame(columns=columns)
+
+    counts = explode_categories(counts)
+    rollup = counts.pivot_table(
+        index=['user_id', 'category', 'day'],
+        columns='interaction_type',
+        values='n',
+        aggfunc='sum',
+        fill_value=0
+    ).rename(columns=ROLLUP_COLUMNS).rename_axis(columns=None)
+    rollup = rollup.reindex(columns=list(ROLLUP_COLUMNS.values()), fill_value=0).astype(int)
+    return rollup.reset_index()[columns]
+
+
+def compute_category_affinity(rollup, now, half_life_days=7.0):
+    """
+    Weighted, recency-decayed engagement per (user_id, category) from
+    `user_category_daily` rows.
+
+    A day's interactions are treated as happening at midday, so an
+    interaction `half_life_days` old counts half as much as one from
+    `now`. Scores from separate chunks of rows can be summed.
+    """
+    if rollup.empty:
+        return pd.DataFrame(columns=['user_id', 'category', 'score'])
+
+    weights = sum(
+        rollup[column].to_numpy(dtype=float) * INTERACTION_WEIGHTS[interaction_type]
+        for interaction_type, column in ROLLUP_COLUMNS.items()
+    )
+    midday = pd.to_datetime(rollup['day']) + pd.Timedelta(hours=12)
+    age_days = (pd.Timestamp(now) - midday).dt.total_seconds().to_numpy() / 86400.0
+    decay = np.exp(-np.log(2) * np.clip(age_days, 0, None) / half_life_days)
+
+    scored = pd.DataFrame({
+        'user_id': rollup['user_id'].to_numpy(),
+        'category': rollup['category'].to_numpy(),
+        'score': weights * decay,
+    })
+    return scored.groupby(['user_id', 'category'], as_index=False, sort=False)['score'].sum()
+
+
+def select_preferred_categories(affinity, max_categories=3, min_share=0.15, ambiguity_ratio=0.9):
+    """
+    Pick 1-`max_categories` categories per user from an affinity table.
+
+    The top category is always kept; the next ones only if they hold at
+    least `min_share` of the user's total score. A user is flagged
+    ambiguous when the best excluded category scores within
+    `ambiguity_ratio` of the last kept one, i.e. the cut is close to a
+    coin flip. Returns a DataFrame indexed by user_id with
+    `categories` (list) and `ambiguous` (bool) columns.
+    """
+    if affinity.empty:
+        return pd.DataFrame(columns=['categories', 'ambiguous'])
+
+    ranked = affinity[affinity['score'] > 0].sort_values(['user_id', 'score'], ascending=[True, False])
+    ranked = ranked.assign(
+        rank=ranked.groupby('user_id', sort=False).cumcount(),
+        share=ranked['score'] / ranked.groupby('user_id', sort=False)['score'].transform('sum')
+    )
+
+    keep = (ranked['rank'] == 0) | ((ranked['rank'] < max_categories) & (ranked['share'] >= min_share))
+    selected = ranked[keep].groupby('user_id', sort=False)['category'].agg(list).rename('categories')
+
+    # Ambiguous when the last kept category and the best excluded one are nearly tied
+    kept_count = keep.groupby(ranked['user_id'], sort=False).sum()
+    last_kept = ranked[ranked['rank'] == ranked['user_id'].map(kept_count) - 1].set_index('user_id')['score']
+    first_dropped = ranked[ranked['rank'] == ranked['user_id'].map(kept_count)].set_index('user_id')['score']
+    ambiguous = (first_dropped / last_kept.reindex(first_dropped.index)) >= ambiguity_ratio
+
+    result = selected.to_frame()
+    result['ambiguous'] = ambiguous.reindex(result.index, fill_value=False).astype(bool)
+    return result
@@ -0,0 +1,215 @@
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from pandas.api.types import union_categoricals
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+# Low-cardinality string columns, stored once per distinct value with int codes per row
+CATEGORICAL_COLUMNS = ['video_id', 'user_id', 'category']
+COUNT_COLUMNS = ['likes', 'comments', 'views']
+
+
+def compact_chunk(chunk):
+    """Convert one chunk from pd.read_sql to compact dtypes before the next one is read."""
+    chunk = chunk.copy()
+    chunk['category'] = chunk['category'].fillna('')
+    for column in CATEGORICAL_COLUMNS:
+        chunk[column] = chunk[column].astype('category')
+    for column in COUNT_COLUMNS:
+        chunk[column] = chunk[column].fillna(0).astype(np.int32)
+    return chunk
+
+
+def concat_compact(chunks):
+    """Concatenate compacted chunks without falling back to object dtype for categoricals."""
+    chunks = list(chunks)
+    if not chunks:
+        return None
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+
+    columns = {}
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([chunk[column] for chunk in chunks])
+        else:
+            columns[column] = np.concatenate([chunk[column].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
+
+
+def fit_category_vectorizer(categories):
+    """
+    Fit a TF-IDF vectorizer on a categorical category column.
+
+    Only the distinct category strings are tokenized; document frequencies
+    are weighted by how many videos share each string. This gives the same
+    vocabulary and idf as fitting on every row. Returns the vectorizer and
+    the TF-IDF matrix of the distinct strings, in category-code order.
+    """
+    unique_strings = list(categories.cat.categories)
+    counts = np.bincount(categories.cat.codes, minlength=len(unique_strings))
+
+    counter = CountVectorizer(binary=True)
+    presence = counter.fit_transform(unique_strings)
+    document_frequency = np.asarray(presence.T @ counts).ravel()
+
+    # Same smoothing as TfidfVectorizer's default smooth_idf=True
+    n_documents = len(categories)
+    vectorizer = TfidfVectorizer(vocabulary=counter.vocabulary_)
+    vectorizer.idf_ = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+    return vectorizer, vectorizer.transform(unique_strings)
+
+
+def engagement_scores(df):
+    """Min-max normalized likes + 2 x comments + 0.5 x views, as float32."""
+    engagement = (
+        df['likes'].to_numpy(dtype=np.float32) * 1.0 +
+        df['comments'].to_numpy(dtype=np.float32) * 2.0 +
+        df['views'].to_numpy(dtype=np.float32) * 0.5
+    )
+    spread = engagement.max() - engagement.min()
+    return (engagement - engagement.min()) / spread if spread else np.zeros_like(engagement)
+
+
+def split_categories(value):
+    """Lower-cased category names from a comma-joined category string, without 'None'."""
+    names = (name.strip().lower() for name in (value or '').split(','))
+    return [name for name in names if name and name != 'none']
+
+
+def build_category_index(categories):
+    """
+    Inverted index from category name to the sorted int32 row positions of
+    the videos in it, built from a categorical column of comma-joined
+    category strings. Each distinct string is split only once.
+    """
+    codes = categories.cat.codes.to_numpy()
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    bounds = np.searchsorted(codes[order], np.arange(len(categories.cat.categories) + 1))
+
+    rows_by_name = {}
+    for code, value in enumerate(categories.cat.categories):
+        rows = order[bounds[code]:bounds[code + 1]]
+        for name in split_categories(value):
+            rows_by_name.setdefault(name, []).append(rows)
+    return {name: np.sort(np.concatenate(parts)) for name, parts in rows_by_name.items()}
+
+
+def build_recommendation_model(df):
+    """
+    Build the recommendation artifact from compact video data.
+
+    Category similarity only depends on the category string, so it is
+    stored between distinct strings (`category_similarity`, indexed by
+    category code) rather than per pair of videos. `category_index` maps
+    each category name to its video rows. The distinct-string TF-IDF rows
+    are kept as `category_matrix` so videos can be appended later without
+    refitting.
+    """
+    vectorizer, unique_matrix = fit_category_vectorizer(df['category'])
+    df['engagement_score'] = engagement_scores(df)
+
+    trained_at = datetime.now()
+    return {
+        'vectorizer': vectorizer,
+        'category_matrix': unique_matrix,
+        'category_similarity': cosine_similarity(unique_matrix).astype(np.float32),
+        'category_index': build_category_index(df['category']),
+        'video_data': df,
+        'trained_at': trained_at,
+        'updated_at': trained_at
+    }
+
+
+def append_videos(model_data, new_videos):
+    """
+    Add compacted `new_videos` rows to an artifact in place, reusing its
+    fitted vectorizer. Only similarities involving unseen category strings
+    are computed; videos already in the artifact are skipped. Returns the
+    number of videos added.
+    """
+    df = model_data['video_data']
+    new_videos = new_videos[~new_videos['video_id'].isin(df['video_id'])]
+    if new_videos.empty:
+        return 0
+
+    # Unseen category strings are transformed with the existing vocabulary and idf
+    known = list(df['category'].cat.categories)
+    known_set = set(known)
+    unseen = [category for category in new_videos['category'].astype(str).unique() if category not in known_set]
+    unique_matrix = model_data['category_matrix']
+    category_similarity = model_data['category_similarity']
+    if unseen:
+        unique_matrix = sp.vstack([unique_matrix, model_data['vectorizer'].transform(unseen)]).tocsr()
+        new_rows = cosine_similarity(unique_matrix[len(known):], unique_matrix).astype(np.float32)
+        expanded = np.empty((len(known) + len(unseen),) * 2, dtype=np.float32)
+        expanded[:len(known), :len(known)] = category_similarity
+        expanded[len(known):, :] = new_rows
+        expanded[:len(known), len(known):] = new_rows[:, :len(known)].T
+        category_similarity = expanded
+
+    combined = concat_compact([df.drop(columns='engagement_score'), new_videos.reset_index(drop=True)])
+    combined['category'] = pd.Categorical(combined['category'].astype(str), categories=known + unseen)
+    combined['engagement_score'] = engagement_scores(combined)
+
+    model_data.update({
+        'category_matrix': unique_matrix,
+        'category_similarity': category_similarity,
+        'category_index': build_category_index(combined['category']),
+        'video_data': combined,
+        'updated_at': datetime.now()
+    })
+    return len(new_videos)
+
+
+def set_engagement_counts(model_data, counts):
+    """
+    Overwrite the artifact's counts with current per-video `counts`
+    (video_id, likes, comments, views) and renormalize engagement scores
+    in place. Videos not in the artifact are ignored. Returns the number of
+    videos whose counts changed; nothing is touched if none did.
+    """
+    df = model_data['video_data']
+    video_ids = df['video_id'].cat
+    row_of_code = np.empty(len(video_ids.categories), dtype=np.int64)
+    row_of_code[video_ids.codes.to_numpy()] = np.arange(len(df))
+
+    codes = video_ids.categories.get_indexer(counts['video_id'].astype(str))
+    matched = codes >= 0
+    if not matched.any():
+        return 0
+
+    rows = row_of_code[codes[matched]]
+    values = {column: counts[column].to_numpy()[matched].astype(np.int32) for column in COUNT_COLUMNS}
+    changed = np.zeros(len(rows), dtype=bool)
+    for column in COUNT_COLUMNS:
+        changed |= df[column].to_numpy()[rows] != values[column]
+    if not changed.any():
+        return 0
+
+    for column in COUNT_COLUMNS:
+        updated = df[column].to_numpy().copy()
+        updated[rows] = values[column]
+        df[column] = updated
+    df['engagement_score'] = engagement_scores(df)
+    model_data['updated_at'] = datetime.now()
+    return int(changed.sum())
+
+
+def trace_peak_memory(func, *args, **kwargs):
+    """Run `func` under tracemalloc and return (result, peak traced bytes)."""
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return result, peak
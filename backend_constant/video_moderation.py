@@ -0,0 +1,505 @@
+import os
+import json
+import time
+import asyncio
+import random
+import heapq
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+VIDEO_SAFETY_INSTRUCTION = """Analyze the video for safety and appropriateness. Check for:
+                1. Explicit adult content or nudity
+                2. Graphic violence or gore
+                3. Hate speech or extremist content
+                4. Dangerous or illegal activities
+                5. Harassment or bullying
+                6. Self-harm or suicide content
+                7. Child exploitation
+                8. Misleading or harmful misinformation
+
+                Respond with whether the video is safe for a general audience platform.
+                A video should be marked unsafe if it contains any of the above content."""
+
+VIDEO_SAFETY_PROMPT = "Is this video safe and appropriate for our platform? Analyze it thoroughly."
+
+KEYFRAME_SAFETY_PROMPT = """These images are keyframes sampled in order from a single video.
+Is this video safe and appropriate for our platform? Analyze them thoroughly.
+Set confident to false if the frames alone are not enough to decide, for example
+when speech, audio or motion between frames could change the verdict."""
+
+
+def extract_keyframes(video_path, output_dir, budget=8, strategy="scene", max_width=512):
+    """
+    Sample up to `budget` JPEG frames from a video into `output_dir`.
+
+    "even" spaces frames uniformly over the clip; "scene" scans at ~2 fps and
+    keeps the frames whose colour histogram changes most from the previous
+    sample. Returns (frame_paths, duration_seconds).
+    """
+    import cv2
+    import numpy as np
+
+    def shrink(frame):
+        height, width = frame.shape[:2]
+        if width <= max_width:
+            return frame
+        return cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            return [], 0.0
+        duration = frame_count / fps
+
+        selected = []
+        if strategy == "even":
+            for index in np.unique(np.linspace(0, frame_count - 1, budget).astype(int)):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+                ok, frame = cap.read()
+                if ok:
+                    selected.append((int(index), shrink(frame)))
+        else:
+            step = max(1, int(round(fps / 2)))
+            heap = []
+            frames = {}
+            previous = None
+            index = 0
+            while cap.grab():
+                if index % step == 0:
+                    ok, frame = cap.retrieve()
+                    if ok:
+                        small = cv2.cvtColor(cv2.resize(frame, (64, 36)), cv2.COLOR_BGR2HSV)
+                        hist = cv2.calcHist([small], [0, 1], None, [16, 16], [0, 180, 0, 256])
+                        cv2.normalize(hist, hist)
+                        # The first frame always scores highest so the opening shot is kept
+                        score = 1.0 if previous is None else cv2.compareHist(previous, hist, cv2.HISTCMP_BHATTACHARYYA)
+                        previous = hist
+                        if len(heap) < budget:
+                            heapq.heappush(heap, (score, index))
+                            frames[index] = shrink(frame)
+                        elif score > heap[0][0]:
+                            _, evicted = heapq.heapreplace(heap, (score, index))
+                            del frames[evicted]
+                            frames[index] = shrink(frame)
+                index += 1
+            selected = sorted(frames.items())
+
+        paths = []
+        for position, (index, frame) in enumerate(selected):
+            path = os.path.join(output_dir, f"frame_{position:03d}_{index}.jpg")
+            cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            paths.append(path)
+        return paths, duration
+    finally:
+        cap.release()
+
+
+class ModerationClient(ABC):
+    """
+    What the pipeline needs from a video analysis backend. Methods are
+    blocking; the pipeline runs them in worker threads.
+    """
+
+    @abstractmethod
+    def upload(self, path, mime_type):
+        """Upload a file and return a handle with a `name` attribute."""
+
+    @abstractmethod
+    def get_state(self, name):
+        """Return the processing state of an uploaded file: PROCESSING, ACTIVE or FAILED."""
+
+    @abstractmethod
+    def classify(self, files, prompt):
+        """Return the raw JSON text verdict for the uploaded files."""
+
+    @abstractmethod
+    def classify_images(self, images, prompt):
+        """Return the raw JSON text verdict for `images`, a list of (bytes, mime_type) sent inline with the request."""
+
+    def delete(self, name):
+        pass
+
+
+class GeminiClient(ModerationClient):
+    def __init__(self, model_name="gemini-2.0-flash-exp"):
+        import google.generativeai as genai
+        from google.ai.generativelanguage_v1beta.types import content
+
+        self._genai = genai
+        generation_config = {
+            "temperature": 0,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": 8192,
+            "response_schema": content.Schema(
+                type=content.Type.OBJECT,
+                required=["is_safe", "reason"],
+                properties={
+                    "is_safe": content.Schema(
+                        type=content.Type.BOOLEAN,
+                        description="Whether the video is safe for the platform"
+                    ),
+                    "reason": content.Schema(
+                        type=content.Type.STRING,
+                        description="Explanation of why the video is safe or unsafe"
+                    ),
+                    "confident": content.Schema(
+                        type=content.Type.BOOLEAN,
+                        description="Whether the provided material was enough to reach a verdict"
+                    ),
+                },
+            ),
+            "response_mime_type": "application/json",
+        }
+        self._model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            system_instruction=VIDEO_SAFETY_INSTRUCTION
+        )
+
+    def upload(self, path, mime_type):
+        return self._genai.upload_file(path, mime_type=mime_type)
+
+    def get_state(self, name):
+        return self._genai.get_file(name).state.name
+
+    def classify(self, files, prompt):
+        chat = self._model.start_chat(history=[{"role": "user", "parts": list(files)}])
+        return chat.send_message(prompt).text
+
+    def classify_images(self, images, prompt):
+        parts = [{"mime_type": mime_type, "data": data} for data, mime_type in images]
+        return self._model.generate_content(parts + [prompt]).text
+
+    def delete(self, name):
+        self._genai.delete_file(name)
+
+
+class FakeFile:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+class FakeGeminiClient(ModerationClient):
+    """
+    In-process stand-in for Gemini used by benchmarks and local runs. Simulates
+    upload time proportional to size, a number of PROCESSING polls and a fixed
+    classification latency, and records what it was asked to do.
+    """
+
+    def __init__(self, upload_seconds_per_mb=0.05, processing_seconds=2.0, classify_seconds=1.0,
+                 unsafe_ratio=0.1, failure_ratio=0.0, seed=None):
+        self.upload_seconds_per_mb = upload_seconds_per_mb
+        self.processing_seconds = processing_seconds
+        self.classify_seconds = classify_seconds
+        self.unsafe_ratio = unsafe_ratio
+        self.failure_ratio = failure_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ready_at = {}
+        self._counter = 0
+        self._in_flight = 0
+        self.max_in_flight = 0
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.state_polls = 0
+        self.classifications = 0
+        self.inline_bytes = 0
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def upload(self, path, mime_type):
+        self._enter()
+        try:
+            size = os.path.getsize(path)
+            time.sleep(self.upload_seconds_per_mb * size / (1024 * 1024))
+            if self._random.random() < self.failure_ratio:
+                raise ConnectionError("Simulated upload failure")
+            with self._lock:
+                self._counter += 1
+                name = f"files/fake-{self._counter}"
+                self._ready_at[name] = time.monotonic() + self.processing_seconds
+                self.uploads += 1
+                self.bytes_uploaded += size
+            return FakeFile(name, size)
+        finally:
+            self._exit()
+
+    def get_state(self, name):
+        with self._lock:
+            self.state_polls += 1
+        return "ACTIVE" if time.monotonic() >= self._ready_at[name] else "PROCESSING"
+
+    def classify(self, files, prompt):
+        return self._verdict()
+
+    def classify_images(self, images, prompt):
+        size = sum(len(data) for data, _ in images)
+        # Inline parts travel with the request, so they cost transfer time but no processing wait
+        time.sleep(self.upload_seconds_per_mb * size / (1024 * 1024))
+        with self._lock:
+            self.inline_bytes += size
+        return self._verdict()
+
+    def _verdict(self):
+        self._enter()
+        try:
+            time.sleep(self.classify_seconds)
+            with self._lock:
+                self.classifications += 1
+                is_safe = self._random.random() >= self.unsafe_ratio
+            return json.dumps({
+                "is_safe": is_safe,
+                "confident": True,
+                "reason": "Simulated verdict: " + ("no policy violations found" if is_safe else "policy violation detected")
+            })
+        finally:
+            self._exit()
+
+    def delete(self, name):
+        self._ready_at.pop(name, None)
+
+
+class RateLimiter:
+    """Spaces out calls so no more than `per_minute` start in any rolling minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class VideoModerationPipeline:
+    """
+    Runs several video analyses concurrently against a ModerationClient.
+
+    `concurrency` caps how many videos are in flight, `requests_per_minute`
+    caps uploads and classification calls, and file processing is polled
+    with exponential backoff instead of a fixed sleep.
+
+    With `mode="keyframes"` a small set of sampled frames is sent inline
+    with a single request instead of uploading the whole file. Clips
+    shorter than `keyframe_min_seconds` and frame verdicts the model is
+    not confident about fall back to a full upload.
+    """
+
+    def __init__(self, client, concurrency=4, requests_per_minute=60, poll_initial=1.0,
+                 poll_max=30.0, processing_timeout=600, max_retries=3, retry_delay=2,
+                 mode="full", keyframe_budget=8, keyframe_strategy="scene", keyframe_min_seconds=15):
+        self.client = client
+        self.mode = mode
+        self.keyframe_budget = keyframe_budget
+        self.keyframe_strategy = keyframe_strategy
+        self.keyframe_min_seconds = keyframe_min_seconds
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_minute)
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.processing_timeout = processing_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    async def wait_for_active(self, name):
+        delay = self.poll_initial
+        deadline = time.monotonic() + self.processing_timeout
+        while True:
+            state = await asyncio.to_thread(self.client.get_state, name)
+            if state == "ACTIVE":
+                return
+            if state != "PROCESSING":
+                raise Exception(f"File {name} failed to process")
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"File {name} still processing after {self.processing_timeout}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_max)
+
+    async def _upload(self, path, mime_type, usage):
+        await self.limiter.acquire()
+        uploaded = await asyncio.to_thread(self.client.upload, path, mime_type)
+        usage['bytes_uploaded'] += os.path.getsize(path)
+        await self.wait_for_active(uploaded.name)
+        return uploaded
+
+    async def _delete(self, files):
+        for uploaded in files:
+            try:
+                await asyncio.to_thread(self.client.delete, uploaded.name)
+            except Exception as e:
+                print(f"[{datetime.now()}] Error deleting uploaded file {uploaded.name}: {e}")
+
+    @staticmethod
+    def _parse_verdict(response_text):
+        try:
+            result = json.loads(response_text)
+            return {
+                'status': 'approved' if result['is_safe'] else 'rejected',
+                'reason': result['reason'],
+                'confident': result.get('confident', True)
+            }
+        except (json.JSONDecodeError, KeyError, TypeError):
+            print(f"Error parsing Gemini response: {response_text}")
+            return None
+
+    async def analyze_images(self, paths, mime_type="image/jpeg", prompt=KEYFRAME_SAFETY_PROMPT, usage=None):
+        """
+        Send the images at `paths` inline with a single classification request,
+        so there are no uploads or processing polls. Same result as analyze_files.
+        """
+        if usage is None:
+            usage = {'bytes_uploaded': 0}
+        images = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                images.append((f.read(), mime_type))
+
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                await self.limiter.acquire()
+                usage['bytes_uploaded'] += sum(len(data) for data, _ in images)
+                response_text = await asyncio.to_thread(self.client.classify_images, images, prompt)
+                result = self._parse_verdict(response_text)
+                if result is not None:
+                    return result
+                last_error = "Failed to parse Gemini response"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                last_error = str(e)
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+
+        print(f"All retry attempts failed. Last error: {last_error}")
+        return None
+
+    async def analyze_files(self, paths, mime_type="video/mp4", prompt=VIDEO_SAFETY_PROMPT, usage=None):
+        """Upload `paths`, ask for a verdict and return {'status', 'reason', 'confident'}, or None if every attempt failed."""
+        if usage is None:
+            usage = {'bytes_uploaded': 0}
+        last_error = None
+        for attempt in range(self.max_retries):
+            uploaded = []
+            try:
+                results = await asyncio.gather(*(self._upload(path, mime_type, usage) for path in paths), return_exceptions=True)
+                uploaded = [r for r in results if not isinstance(r, BaseException)]
+                for r in results:
+                    if isinstance(r, BaseException):
+                        raise r
+
+                await self.limiter.acquire()
+                response_text = await asyncio.to_thread(self.client.classify, uploaded, prompt)
+
+                result = self._parse_verdict(response_text)
+                if result is not None:
+                    return result
+                last_error = "Failed to parse Gemini response"
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                last_error = str(e)
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+            finally:
+                # Shielded so a cancelled run still cleans up what it uploaded
+                await asyncio.shield(self._delete(uploaded))
+
+        print(f"All retry attempts failed. Last error: {last_error}")
+        return None
+
+    async def _analyze_keyframes(self, video_path, usage):
+        with tempfile.TemporaryDirectory() as frame_dir:
+            frames, duration = await asyncio.to_thread(
+                extract_keyframes, video_path, frame_dir, self.keyframe_budget, self.keyframe_strategy
+            )
+            if not frames or duration < self.keyframe_min_seconds:
+                return None
+            result = await self.analyze_images(frames, "image/jpeg", KEYFRAME_SAFETY_PROMPT, usage)
+            if result is None or not result['confident']:
+                return None
+            return result
+
+    async def analyze(self, video_path):
+        """
+        Return {'status', 'reason', 'metrics'} for a video file, or None on failure.
+        `metrics` records the mode used, bytes uploaded against the file size and latency.
+        """
+        if not os.path.exists(video_path) or os.path.getsize(video_path) == 0:
+            print(f"Error: Video file {video_path} is empty or does not exist")
+            return None
+
+        start = time.perf_counter()
+        usage = {'bytes_uploaded': 0}
+        result = None
+        mode = "full"
+
+        if self.mode == "keyframes":
+            try:
+                result = await self._analyze_keyframes(video_path, usage)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{datetime.now()}] Keyframe sampling failed for {video_path}: {e}")
+            mode = "keyframes" if result is not None else "keyframes->full"
+
+        if result is None:
+            result = await self.analyze_files([video_path], usage=usage)
+            if result is None:
+                return None
+
+        result['metrics'] = {
+            'mode': mode,
+            'bytes_uploaded': usage['bytes_uploaded'],
+            'video_bytes': os.path.getsize(video_path),
+            'seconds': time.perf_counter() - start
+        }
+        return result
+
+    async def run(self, items, process):
+        """
+        Call `await process(item)` for every item with at most `concurrency`
+        running at once. Cancelling run() cancels all outstanding items.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(item):
+            async with semaphore:
+                try:
+                    await process(item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[{datetime.now()}] Error moderating {item}: {e}")
+
+        tasks = [asyncio.create_task(guarded(item)) for item in items]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
@@ -0,0 +1,108 @@
+"""
+Latency and throughput of the inline comment moderation endpoint (/moderate).
+
+Against a running constant_run.py:
+
+    python benchmarks/comment_moderation_service.py --url http://127.0.0.1:5177/moderate
+
+Without --url an in-process service is started with a fake classifier whose
+cost is `--base-ms + --per-item-ms * batch_size`, which isolates the
+batching and HTTP overhead from the model itself.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend_constant"))
+
+from micro_batcher import MicroBatcher
+from moderation_events import ModerationEventListener
+
+SAMPLE_COMMENTS = [
+    "Great video!",
+    "This is so funny lol",
+    "Where did you buy that jacket?",
+    "first",
+    "I learned a lot from this, thanks for sharing",
+    "Check out my channel for more",
+]
+
+
+def fake_classifier(base_ms, per_item_ms):
+    def classify(texts):
+        time.sleep((base_ms + per_item_ms * len(texts)) / 1000)
+        return [
+            {"status": "approved", "labels": "{}", "score": 0.99, "reason": "Comment classified as OK with 99.00% confidence"}
+            for _ in texts
+        ]
+    return classify
+
+
+def call(url, text):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"text": text}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(url, requests, concurrency):
+    texts = [f"{SAMPLE_COMMENTS[i % len(SAMPLE_COMMENTS)]} #{i}" for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda text: call(url, text), texts))
+    elapsed = time.perf_counter() - start
+    print(
+        f"concurrency={concurrency:<4} requests={requests:<6} throughput={requests / elapsed:8.1f} req/s  "
+        f"p50={percentile(latencies, 0.50) * 1000:7.1f}ms  p99={percentile(latencies, 0.99) * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--base-ms", type=float, default=15, help="Fake model fixed cost per batch")
+    parser.add_argument("--per-item-ms", type=float, default=1, help="Fake model cost per comment")
+    parser.add_argument("--port", type=int, default=5199)
+    args = parser.parse_args()
+
+    listener = batcher = None
+    url = args.url
+    if url is None:
+        batcher = MicroBatcher(fake_classifier(args.base_ms, args.per_item_ms), args.max_batch, args.max_wait_ms / 1000)
+        batcher.start()
+        listener = ModerationEventListener({}, port=args.port, comment_batcher=batcher, moderate_timeout=10)
+        listener.start()
+        url = f"http://127.0.0.1:{args.port}/moderate"
+
+    try:
+        for concurrency in args.concurrency:
+            run(url, args.requests, concurrency)
+        if batcher is not None:
+            print(f"mean batch size: {batcher.items / max(batcher.batches, 1):.1f}")
+    finally:
+        if listener is not None:
+            listener.stop()
+            batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Insert throughput and size of an interactions table keyed by random UUID4
+strings versus time-ordered UUIDv7 stored as 16 bytes.
+
+Uses a file-backed SQLite WITHOUT ROWID table, which is clustered on its
+primary key like an InnoDB table, with the (user_id, interaction_timestamp)
+secondary index from the migrations. A small page cache stands in for a
+buffer pool that no longer holds the whole table. No MySQL needed.
+
+    python benchmarks/id_insert_throughput.py --rows 1000000 --cache-mb 8
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from ids import uuid7
+
+SCHEMES = {
+    "uuid4 text": ("TEXT", lambda: str(uuid.uuid4())),
+    "uuid7 binary": ("BLOB", lambda: uuid7().bytes),
+}
+
+
+def run_scheme(directory, name, key_type, new_id, rows, batch, cache_mb, users, seed):
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    path = os.path.join(directory, name.replace(" ", "_") + ".db")
+    db = sqlite3.connect(path)
+    db.execute(f"PRAGMA cache_size = -{cache_mb * 1024}")
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.executescript(f"""
+        CREATE TABLE user_video_interactions (
+            interaction_id {key_type} NOT NULL,
+            user_id TEXT,
+            video_id TEXT,
+            interaction_type TEXT,
+            interaction_timestamp TEXT NOT NULL,
+            PRIMARY KEY (interaction_id, interaction_timestamp)
+        ) WITHOUT ROWID;
+        CREATE INDEX idx_interactions_user_time ON user_video_interactions (user_id, interaction_timestamp);
+    """)
+
+    started = datetime(2026, 1, 1)
+    rates = []
+    total_start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        values = [
+            (
+                new_id(),
+                rng.choice(user_ids),
+                str(uuid.UUID(int=rng.getrandbits(128))),
+                "view",
+                (started + timedelta(milliseconds=offset + i)).isoformat(sep=" ")
+            )
+            for i in range(min(batch, rows - offset))
+        ]
+        batch_start = time.perf_counter()
+        with db:
+            db.executemany("INSERT INTO user_video_interactions VALUES (?, ?, ?, ?, ?)", values)
+        rates.append(len(values) / (time.perf_counter() - batch_start))
+    elapsed = time.perf_counter() - total_start
+
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    pages = db.execute("PRAGMA page_count").fetchone()[0]
+    page_size = db.execute("PRAGMA page_size").fetchone()[0]
+    db.close()
+
+    tenth = max(1, len(rates) // 10)
+    return {
+        "rows_per_second": rows / elapsed,
+        "first_tenth": sum(rates[:tenth]) / tenth,
+        "last_tenth": sum(rates[-tenth:]) / tenth,
+        "size_mb": pages * page_size / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--batch", type=int, default=500, help="rows per transaction, as the interaction buffer writes")
+    parser.add_argument("--cache-mb", type=int, default=4)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"Inserting {args.rows} interactions in batches of {args.batch} with a {args.cache_mb}MB page cache")
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, (key_type, new_id) in SCHEMES.items():
+            results[name] = run_scheme(
+                directory, name, key_type, new_id,
+                args.rows, args.batch, args.cache_mb, args.users, args.seed
+            )
+            result = results[name]
+            print(
+                f"{name:<14} {result['rows_per_second']:10.0f} rows/s  "
+                f"first 10% {result['first_tenth']:9.0f}/s  last 10% {result['last_tenth']:9.0f}/s  "
+                f"size {result['size_mb']:7.1f}MB"
+            )
+
+    random_keys, ordered_keys = results["uuid4 text"], results["uuid7 binary"]
+    print(
+        f"uuid7 binary: {ordered_keys['rows_per_second'] / random_keys['rows_per_second']:.2f}x throughput, "
+        f"{ordered_keys['size_mb'] / random_keys['size_mb']:.2f}x size"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Recommender benchmark and offline evaluation on synthetic data.
+
+Generates users, multi-category videos and popularity-skewed interaction
+logs, holds out each user's latest interaction, trains the model the way
+constant_run.py does and then times artifact load and per-request
+recommend_videos latency and memory. Offline quality is reported as
+hit-rate@k and NDCG@k on the held-out interactions.
+
+    python -m benchmarks.recommender --videos 10000 --users 5000
+    python -m benchmarks.recommender --videos 1000000 --users 100000 --json results.json
+
+Run from the repository root. Needs the backend and backend_constant
+requirements installed, but no MySQL.
+"""
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+sys.path.insert(0, os.path.join(ROOT, "backend_constant"))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from training_data import compact_chunk, concat_compact, build_recommendation_model, trace_peak_memory
+from recommend_videos import recommend_videos
+from seen_videos import SeenVideosCache
+
+from benchmarks.recommender import __doc__ as USAGE
+from benchmarks.recommender.synthetic import generate_dataset, split_holdout, video_counts
+from benchmarks.recommender.evaluate import user_categories, seen_videos, evaluate
+
+
+def train(videos, chunk_rows):
+    chunks = (videos.iloc[start:start + chunk_rows] for start in range(0, len(videos), chunk_rows))
+    return build_recommendation_model(concat_compact(compact_chunk(chunk) for chunk in chunks))
+
+
+def time_artifact_load(model_data):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(model_data, f)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            pickle.load(f)
+        return time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--interactions-per-user", type=int, default=20)
+    parser.add_argument("--eval-users", type=int, default=200, help="users to request recommendations for")
+    parser.add_argument("--k", type=int, default=8, help="recommendations per request, as in the API")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = {'videos': args.videos, 'users': args.users, 'seed': args.seed}
+
+    start = time.perf_counter()
+    videos, interactions = generate_dataset(args.videos, args.users, mean_interactions=args.interactions_per_user, seed=args.seed)
+    train_events, held_out = split_holdout(interactions)
+    print(f"Generated {len(videos)} videos and {len(interactions)} interactions in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    model_data, peak = trace_peak_memory(train, video_counts(videos, train_events), args.chunk_rows)
+    results['train_seconds'] = time.perf_counter() - start
+    results['train_peak_mb'] = peak / 1024 / 1024
+
+    load_seconds, artifact_bytes = time_artifact_load(model_data)
+    results['artifact_mb'] = artifact_bytes / 1024 / 1024
+    results['artifact_load_seconds'] = load_seconds
+
+    categories = user_categories(videos, train_events, datetime.now()).to_dict()
+    seen = seen_videos(train_events)
+    rng = np.random.default_rng(args.seed)
+    eval_users = rng.choice(held_out.index.to_numpy(), min(args.eval_users, len(held_out)), replace=False)
+
+    # Same exclusion path as the API: a cached seen-set per user over model rows
+    seen_cache = SeenVideosCache(lambda user_id: seen.get(user_id, []))
+
+    def recommend(user_id, user_categories, top_n):
+        seen_mask = seen_cache.mask(user_id, model_data)
+        return recommend_videos(user_categories, top_n=top_n, model_data=model_data, seen_mask=seen_mask)
+
+    results.update(evaluate(recommend, eval_users, categories, held_out, args.k))
+
+    # Popularity-only baseline to judge whether category matching earns its cost
+    popular = model_data['video_data'].sort_values('engagement_score', ascending=False)['video_id'].astype(str).tolist()
+
+    def recommend_popular(user_id, user_categories, top_n):
+        viewed = set(seen.get(user_id, []))
+        return [{'video_id': video_id} for video_id in popular if video_id not in viewed][:top_n]
+
+    baseline = evaluate(recommend_popular, eval_users, categories, held_out, args.k, memory_samples=0)
+    results[f'popular_hit_rate@{args.k}'] = baseline[f'hit_rate@{args.k}']
+    results[f'popular_ndcg@{args.k}'] = baseline[f'ndcg@{args.k}']
+
+    for name, value in results.items():
+        print(f"{name:<24} {value:.4f}" if isinstance(value, float) else f"{name:<24} {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from preferences import build_daily_rollup, compute_category_affinity, select_preferred_categories
+
+
+def user_categories(videos, train, now):
+    """Preferred categories per user, computed the way the preference job does."""
+    events = train.merge(videos[['video_id', 'category']], on='video_id')
+    counts = (
+        events.assign(day=events['interaction_timestamp'].dt.date)
+        .groupby(['user_id', 'category', 'day', 'interaction_type'], as_index=False)
+        .size()
+        .rename(columns={'size': 'n'})
+    )
+    affinity = compute_category_affinity(build_daily_rollup(counts), now)
+    return select_preferred_categories(affinity)['categories']
+
+
+def ranking_metrics(recommended_ids, held_out_id, k):
+    """Hit and NDCG@k for a single held-out item."""
+    top = list(recommended_ids)[:k]
+    if held_out_id not in top:
+        return 0.0, 0.0
+    return 1.0, 1.0 / np.log2(top.index(held_out_id) + 2)
+
+
+def evaluate(recommend, users, categories, held_out, k, memory_samples=5):
+    """
+    Call `recommend(user_id, categories, top_n)` for each user and
+    collect latency, traced peak memory (first `memory_samples` calls only,
+    since tracing slows everything down) and hit-rate/NDCG@k.
+    """
+    latencies = []
+    peaks = []
+    hits = []
+    ndcgs = []
+    for position, user_id in enumerate(users):
+        args = (user_id, categories.get(user_id) or [], k)
+
+        if position < memory_samples:
+            tracemalloc.start()
+            recommend(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        start = time.perf_counter()
+        recommendations = recommend(*args)
+        latencies.append(time.perf_counter() - start)
+
+        hit, ndcg = ranking_metrics([r['video_id'] for r in recommendations], held_out[user_id], k)
+        hits.append(hit)
+        ndcgs.append(ndcg)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'eval_users': len(users),
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p99': float(np.percentile(latencies, 99)),
+        'request_peak_mb': float(max(peaks) / 1024 / 1024) if peaks else None,
+        f'hit_rate@{k}': float(np.mean(hits)),
+        f'ndcg@{k}': float(np.mean(ndcgs)),
+    }
+
+
+def seen_videos(train):
+    return train.groupby('user_id')['video_id'].agg(lambda ids: list(pd.unique(ids))).to_dict()
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from preferences import CONTENT_CATEGORIES
+
+INTERACTION_TYPES = np.array(['view', 'like', 'comment', 'share'])
+INTERACTION_TYPE_SHARES = [0.70, 0.20, 0.07, 0.03]
+
+
+def generate_videos(rng, videos, creators, second_category_rate=0.3, popularity_skew=1.0):
+    """
+    Videos with one or two categories and a Zipf-like popularity weight.
+
+    Returns the videos DataFrame plus each video's primary category index
+    and popularity, which drive interaction sampling.
+    """
+    n_categories = len(CONTENT_CATEGORIES)
+    primary = rng.integers(0, n_categories, videos)
+    secondary = (primary + rng.integers(1, n_categories, videos)) % n_categories
+    has_second = rng.random(videos) < second_category_rate
+
+    names = np.array(CONTENT_CATEGORIES, dtype=object)
+    category = np.where(has_second, names[primary] + ", " + names[secondary], names[primary])
+
+    popularity = 1.0 / np.power(rng.permutation(videos) + 1.0, popularity_skew)
+
+    df = pd.DataFrame({
+        'video_id': [f"v{i:07d}" for i in range(videos)],
+        'user_id': [f"c{i}" for i in rng.integers(0, creators, videos)],
+        'title': [f"Synthetic video {i}" for i in range(videos)],
+        'category': category,
+    })
+    return df, primary, popularity
+
+
+def _sampler(rng, indices, weights):
+    cumulative = np.cumsum(weights)
+    cumulative /= cumulative[-1]
+    return lambda count: indices[np.minimum(np.searchsorted(cumulative, rng.random(count)), len(indices) - 1)]
+
+
+def generate_interactions(rng, video_ids, primary, popularity, users, mean_interactions=20,
+                          favourite_rate=0.8, window_days=30, now=None):
+    """
+    Interaction log where each user mostly engages with one favourite
+    category and otherwise with globally popular videos. Every user gets
+    at least two interactions so one can be held out.
+    """
+    now = now or datetime.now()
+    favourite = rng.integers(0, len(CONTENT_CATEGORIES), users)
+    per_user = np.maximum(rng.poisson(mean_interactions, users), 2)
+    event_user = np.repeat(np.arange(users), per_user)
+    total = len(event_user)
+
+    event_video = np.empty(total, dtype=np.int64)
+    from_favourite = rng.random(total) < favourite_rate
+    all_videos = np.arange(len(video_ids))
+
+    global_pick = _sampler(rng, all_videos, popularity)
+    event_video[~from_favourite] = global_pick(int((~from_favourite).sum()))
+
+    event_category = favourite[event_user]
+    for category in range(len(CONTENT_CATEGORIES)):
+        mask = from_favourite & (event_category == category)
+        in_category = all_videos[primary == category]
+        if not mask.any():
+            continue
+        if len(in_category) == 0:
+            event_video[mask] = global_pick(int(mask.sum()))
+            continue
+        event_video[mask] = _sampler(rng, in_category, popularity[in_category])(int(mask.sum()))
+
+    age_seconds = rng.random(total) * window_days * 86400
+    return pd.DataFrame({
+        'user_id': np.array([f"u{i}" for i in range(users)], dtype=object)[event_user],
+        'video_id': np.asarray(video_ids, dtype=object)[event_video],
+        'interaction_type': rng.choice(INTERACTION_TYPES, total, p=INTERACTION_TYPE_SHARES),
+        'interaction_timestamp': pd.Timestamp(now) - pd.to_timedelta(age_seconds, unit='s'),
+    })
+
+
+def split_holdout(interactions):
+    """
+    Hold out each user's latest interaction. Training keeps everything else
+    except that user's other interactions with the held-out video, which
+    would otherwise leak it into the exclusion list.
+    """
+    ordered = interactions.sort_values('interaction_timestamp')
+    test = ordered.groupby('user_id', sort=False).tail(1)[['user_id', 'video_id']]
+    held_out = pd.MultiIndex.from_frame(test)
+    train = ordered[~pd.MultiIndex.from_frame(ordered[['user_id', 'video_id']]).isin(held_out)]
+    return train, test.set_index('user_id')['video_id']
+
+
+def video_counts(videos, interactions):
+    """Training-query equivalent: each video with its like, comment and view counts."""
+    counts = pd.crosstab(interactions['video_id'], interactions['interaction_type'])
+    counts = counts.reindex(columns=['like', 'comment', 'view'], fill_value=0)
+    counts.columns = ['likes', 'comments', 'views']
+    return videos.join(counts, on='video_id').fillna({'likes': 0, 'comments': 0, 'views': 0})
+
+
+def generate_dataset(videos=2000, users=1000, creators=None, mean_interactions=20, seed=7):
+    rng = np.random.default_rng(seed)
+    video_df, primary, popularity = generate_videos(rng, videos, creators or max(videos // 10, 1))
+    interactions = generate_interactions(rng, video_df['video_id'].to_numpy(), primary, popularity, users, mean_interactions)
+    return video_df, interactions
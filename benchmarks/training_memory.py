@@ -0,0 +1,99 @@
+"""
+Peak memory of recommendation training versus the size of the saved model.
+
+Compares the old path (whole catalog as object columns, TF-IDF fitted on
+every row, float64 video x video similarity) with the chunked, compact
+loader in backend_constant/training_data.py, which keeps similarity per
+distinct category string. Synthetic rows stand in for the
+training query, fed in chunks the way pd.read_sql(chunksize=...) would.
+
+    python benchmarks/training_memory.py --videos 5000 --chunk-rows 1000
+"""
+import os
+import sys
+import time
+import uuid
+import pickle
+import random
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend_constant"))
+
+from preferences import CONTENT_CATEGORIES
+from training_data import compact_chunk, concat_compact, build_recommendation_model, trace_peak_memory
+
+
+def synthetic_rows(videos, creators, seed):
+    rng = random.Random(seed)
+    creator_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(creators)]
+    rows = []
+    for i in range(videos):
+        categories = rng.sample(CONTENT_CATEGORIES, rng.choice([1, 1, 1, 2, 3]))
+        rows.append({
+            'video_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'user_id': rng.choice(creator_ids),
+            'title': f"Synthetic video number {i} with a reasonably long title",
+            'category': ", ".join(categories),
+            'likes': rng.randint(0, 500),
+            'comments': rng.randint(0, 100),
+            'views': rng.randint(0, 5000),
+        })
+    return rows
+
+
+def train_baseline(rows):
+    df = pd.DataFrame(rows)
+    vectorizer = TfidfVectorizer()
+    category_matrix = vectorizer.fit_transform(df['category'])
+    similarity_matrix = cosine_similarity(category_matrix)
+    df['engagement_score'] = df['likes'] * 1.0 + df['comments'] * 2.0 + df['views'] * 0.5
+    df['engagement_score'] = (df['engagement_score'] - df['engagement_score'].min()) / (df['engagement_score'].max() - df['engagement_score'].min())
+    return {'vectorizer': vectorizer, 'similarity_matrix': similarity_matrix, 'video_data': df}
+
+
+def train_compact(rows, chunk_rows):
+    chunks = (pd.DataFrame(rows[start:start + chunk_rows]) for start in range(0, len(rows), chunk_rows))
+    df = concat_compact(compact_chunk(chunk) for chunk in chunks)
+    return build_recommendation_model(df)
+
+
+def measure(label, func, *args):
+    start = time.perf_counter()
+    model, peak = trace_peak_memory(func, *args)
+    elapsed = time.perf_counter() - start
+    artifact = len(pickle.dumps(model))
+    frame = model['video_data'].memory_usage(deep=True).sum()
+    print(
+        f"{label:<10} peak={peak / 1024 / 1024:8.1f}MB  artifact={artifact / 1024 / 1024:8.1f}MB  "
+        f"peak/artifact={peak / artifact:5.2f}x  video_data={frame / 1024 / 1024:6.1f}MB  time={elapsed:6.2f}s"
+    )
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--creators", type=int, default=500)
+    parser.add_argument("--chunk-rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.videos, args.creators, args.seed)
+    print(f"{args.videos} videos, {args.creators} creators, chunks of {args.chunk_rows}")
+
+    baseline = measure("baseline", train_baseline, rows)
+    compact = measure("compact", train_compact, rows, args.chunk_rows)
+
+    codes = compact['video_data']['category'].cat.codes.to_numpy()
+    expanded = compact['category_similarity'][np.ix_(codes, codes)]
+    difference = np.abs(baseline['similarity_matrix'] - expanded).max()
+    print(f"Max similarity difference: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Video moderation throughput against the in-process fake Gemini client.
+
+Compares the old behaviour (one video at a time, fixed-interval polling)
+with the concurrent pipeline. No network or API key needed.
+
+    python benchmarks/video_moderation.py --videos 20 --concurrency 4
+
+With --video-dir, real clips are used instead of random bytes and full
+upload is also compared with keyframe sampling (needs OpenCV):
+
+    python benchmarks/video_moderation.py --video-dir ../download
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend_constant"))
+
+from video_moderation import FakeGeminiClient, VideoModerationPipeline
+
+
+def make_videos(directory, count, size_mb):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"video_{i}.mp4")
+        with open(path, "wb") as f:
+            f.write(os.urandom(int(size_mb * 1024 * 1024)))
+        paths.append(path)
+    return paths
+
+
+async def run_pipeline(paths, client, concurrency, poll_initial, poll_max, mode="full"):
+    pipeline = VideoModerationPipeline(
+        client,
+        concurrency=concurrency,
+        requests_per_minute=0,
+        poll_initial=poll_initial,
+        poll_max=poll_max,
+        mode=mode
+    )
+    latencies = []
+    verdicts = []
+
+    async def process(path):
+        start = time.perf_counter()
+        verdicts.append(await pipeline.analyze(path))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await pipeline.run(paths, process)
+    return time.perf_counter() - start, latencies, verdicts
+
+
+def report(label, elapsed, latencies, client):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{label:<28} total={elapsed:7.2f}s  videos/min={len(latencies) / elapsed * 60:7.1f}  "
+        f"p50={p50:6.2f}s  p99={p99:6.2f}s  polls={client.state_polls:4d}  max_in_flight={client.max_in_flight}"
+    )
+
+
+def report_upload_modes(label, verdicts):
+    verdicts = [v for v in verdicts if v is not None]
+    uploaded = sum(v['metrics']['bytes_uploaded'] for v in verdicts)
+    original = sum(v['metrics']['video_bytes'] for v in verdicts)
+    fallbacks = sum(1 for v in verdicts if v['metrics']['mode'] == "keyframes->full")
+    mean_seconds = sum(v['metrics']['seconds'] for v in verdicts) / max(len(verdicts), 1)
+    print(
+        f"{label:<28} uploaded={uploaded / 1024 / 1024:8.2f}MB of {original / 1024 / 1024:8.2f}MB "
+        f"({uploaded / max(original, 1):6.1%})  mean_latency={mean_seconds:6.2f}s  fallbacks={fallbacks}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--processing-seconds", type=float, default=3.0)
+    parser.add_argument("--classify-seconds", type=float, default=1.0)
+    parser.add_argument("--video-dir", help="Directory of real .mp4 clips to use instead of random bytes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.video_dir:
+            paths = sorted(
+                os.path.join(args.video_dir, name) for name in os.listdir(args.video_dir)
+                if name.lower().endswith(".mp4")
+            )[:args.videos]
+        else:
+            paths = make_videos(directory, args.videos, args.size_mb)
+
+        def fake():
+            return FakeGeminiClient(
+                processing_seconds=args.processing_seconds,
+                classify_seconds=args.classify_seconds,
+                seed=0
+            )
+
+        # Serial with a fixed poll interval approximates the previous implementation
+        client = fake()
+        elapsed, latencies, _ = asyncio.run(run_pipeline(paths, client, 1, 2.0, 2.0))
+        report("serial, fixed polling", elapsed, latencies, client)
+
+        client = fake()
+        elapsed, latencies, _ = asyncio.run(run_pipeline(paths, client, args.concurrency, 0.25, 4.0))
+        report(f"concurrent x{args.concurrency}, backoff", elapsed, latencies, client)
+
+        if args.video_dir:
+            _, _, verdicts = asyncio.run(run_pipeline(paths, fake(), args.concurrency, 0.25, 4.0, mode="full"))
+            report_upload_modes("full upload", verdicts)
+            _, _, verdicts = asyncio.run(run_pipeline(paths, fake(), args.concurrency, 0.25, 4.0, mode="keyframes"))
+            report_upload_modes("keyframes", verdicts)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { FaHeart, FaReply } from 'react-icons/fa';
 
 interface Comment {
@@ -14,28 +14,41 @@ interface Comment {
   };
 }
 
+interface CommentPage {
+  comments: Comment[];
+  next_cursor: string | null;
+}
+
 interface CommentsProps {
   videoId: string;
   onClose: () => void;
-  onCommentCountUpdate: (newCount: number) => void;
+  onCommentPosted: (comment: Comment) => void;
 }
 
-const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentCountUpdate }) => {
+const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentPosted }) => {
   const [comments, setComments] = useState<Comment[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [newComment, setNewComment] = useState('');
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const listRef = useRef<HTMLDivElement>(null);
+  const sentinelRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
+    setComments([]);
+    setNextCursor(null);
+    setLoading(true);
     fetchComments();
   }, [videoId]);
 
-  const fetchComments = async () => {
+  const fetchComments = async (cursor?: string) => {
     try {
       const token = localStorage.getItem('token');
       if (!token) return;
 
-      const response = await fetch(`/api/videos/${videoId}/comments`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`/api/videos/${videoId}/comments${query}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -45,16 +58,42 @@ const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentCountUpd
         throw new Error('Failed to fetch comments');
       }
 
-      const data = await response.json();
-      setComments(data);
-      onCommentCountUpdate(data.length);
-      setLoading(false);
+      const data: CommentPage = await response.json();
+      if (cursor) {
+        // A comment posted since the first page was loaded can show up again further down
+        setComments(prev => {
+          const seen = new Set(prev.map(comment => comment.comment_id));
+          return [...prev, ...data.comments.filter(comment => !seen.has(comment.comment_id))];
+        });
+      } else {
+        setComments(data.comments);
+      }
+      setNextCursor(data.next_cursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load comments');
+    } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  // Load the next page whenever the end of the list is near, including when a page
+  // is too short to fill the panel and there is nothing to scroll
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !nextCursor || loadingMore) return;
+
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) {
+        observer.disconnect();
+        setLoadingMore(true);
+        fetchComments(nextCursor);
+      }
+    }, { root: listRef.current, rootMargin: '200px' });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [nextCursor, loadingMore, comments.length]);
+
   const handlePostComment = async () => {
     if (!newComment.trim()) return;
 
@@ -85,9 +124,11 @@ const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentCountUpd
       }
 
       const postedComment = await response.json();
-      setComments(prev => [postedComment, ...prev]);
       setNewComment('');
-      onCommentCountUpdate(comments.length + 1);
+      // Comments moderated inline may come back already rejected
+      if (postedComment.moderation_status === 'rejected') return;
+      setComments(prev => [postedComment, ...prev]);
+      onCommentPosted(postedComment);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to post comment');
     }
@@ -130,7 +171,7 @@ const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentCountUpd
       </div>
 
       {/* Comments List */}
-      <div className="flex-1 overflow-y-auto">
+      <div ref={listRef} className="flex-1 overflow-y-auto">
         {loading ? (
           <div className="flex items-center justify-center h-32">
             <div className="animate-spin rounded-full h-8 w-8 border-t-2 border-b-2 border-white"></div>
@@ -171,6 +212,12 @@ const Comments: React.FC<CommentsProps> = ({ videoId, onClose, onCommentCountUpd
                 </div>
               </div>
             ))}
+            <div ref={sentinelRef} />
+            {loadingMore && (
+              <div className="flex items-center justify-center py-2">
+                <div className="animate-spin rounded-full h-6 w-6 border-t-2 border-b-2 border-white"></div>
+              </div>
+            )}
           </div>
         )}
       </div>
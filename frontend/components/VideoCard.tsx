@@ -13,6 +13,7 @@ interface Video {
   comments: number;
   views: number;
   user_id: string;
+  liked: boolean;
   user: {
     username: string;
     profile_picture_url: string;
@@ -25,6 +26,7 @@ interface VideoCardProps {
   isLast: boolean;
   onPrevious: () => void;
   onNext: () => void;
+  onVideoChange: (videoId: string, changes: Partial<Video>) => void;
 }
 
 const VideoCard: React.FC<VideoCardProps> = ({
@@ -32,14 +34,15 @@ const VideoCard: React.FC<VideoCardProps> = ({
   isFirst,
   isLast,
   onPrevious,
-  onNext
+  onNext,
+  onVideoChange
 }) => {
   const videoUrl = `/api/videos/${video.video_id}/stream`;
   const videoRef = useRef<HTMLVideoElement>(null);
   const [isMuted, setIsMuted] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [isLiked, setIsLiked] = useState(false);
+  const [isLiked, setIsLiked] = useState(video.liked);
   const [likesCount, setLikesCount] = useState(video.likes);
   const [commentsCount, setCommentsCount] = useState(video.comments);
   const [showComments, setShowComments] = useState(false);
@@ -48,43 +51,10 @@ const VideoCard: React.FC<VideoCardProps> = ({
   useEffect(() => {
     setIsLoading(true);
     setError(null);
+    setIsLiked(video.liked);
     setLikesCount(video.likes);
     setCommentsCount(video.comments);
     setHasRecordedView(false);
-
-    const fetchVideoData = async () => {
-      try {
-        const token = localStorage.getItem('token');
-        if (!token) return;
-
-        const videoResponse = await fetch(`/api/videos/${video.video_id}`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        
-        if (videoResponse.ok) {
-          const videoData = await videoResponse.json();
-          setLikesCount(videoData.likes);
-          setCommentsCount(videoData.comments);
-        }
-
-        const likeResponse = await fetch(`/api/videos/${video.video_id}/like-status`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        
-        if (likeResponse.ok) {
-          const { liked } = await likeResponse.json();
-          setIsLiked(liked);
-        }
-      } catch (err) {
-        console.error('Error fetching video data:', err);
-      }
-    };
-
-    fetchVideoData();
   }, [video.video_id]);
 
   useEffect(() => {
@@ -174,8 +144,10 @@ const VideoCard: React.FC<VideoCardProps> = ({
       });
 
       if (response.ok) {
+        const newLikesCount = isLiked ? likesCount - 1 : likesCount + 1;
         setIsLiked(!isLiked);
-        setLikesCount(prev => isLiked ? prev - 1 : prev + 1);
+        setLikesCount(newLikesCount);
+        onVideoChange(video.video_id, { liked: !isLiked, likes: newLikesCount });
       }
     } catch (err) {
       console.error('Error toggling like:', err);
@@ -186,8 +158,12 @@ const VideoCard: React.FC<VideoCardProps> = ({
     setShowComments(!showComments);
   };
 
-  const handleCommentCountUpdate = (newCount: number) => {
-    setCommentsCount(newCount);
+  const handleCommentPosted = (comment: { moderation_status: string }) => {
+    // The server's count only includes approved comments; pending ones are counted once moderated
+    if (comment.moderation_status === 'approved') {
+      setCommentsCount(commentsCount + 1);
+      onVideoChange(video.video_id, { comments: commentsCount + 1 });
+    }
   };
 
   const handleProfileClick = () => {
@@ -328,7 +304,7 @@ const VideoCard: React.FC<VideoCardProps> = ({
               <Comments 
                 videoId={video.video_id} 
                 onClose={() => setShowComments(false)}
-                onCommentCountUpdate={handleCommentCountUpdate}
+                onCommentPosted={handleCommentPosted}
               />
             </Suspense>
           </div>
@@ -9,6 +9,7 @@ interface Video {
   comments: number;
   views: number;
   user_id: string;
+  liked: boolean;
   user: {
     username: string;
     profile_picture_url: string;
@@ -21,6 +22,29 @@ const VideoFeed: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
+  // One batched request for cards fetched earlier but not shown yet, whose counts may have moved
+  const refreshVideos = async (videoIds: string[], token: string) => {
+    if (videoIds.length === 0) return;
+    try {
+      const response = await fetch(`/api/videos/batch?ids=${videoIds.map(encodeURIComponent).join(',')}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      });
+      if (!response.ok) return;
+
+      const fresh: Video[] = await response.json();
+      const byId = new Map(fresh.map(video => [video.video_id, video]));
+      setVideos(prev => prev.map(video => byId.get(video.video_id) ?? video));
+    } catch (err) {
+      console.error('Error refreshing videos:', err);
+    }
+  };
+
+  const handleVideoChange = (videoId: string, changes: Partial<Video>) => {
+    setVideos(prev => prev.map(video => video.video_id === videoId ? { ...video, ...changes } : video));
+  };
+
   const fetchRecommendedVideos = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -30,6 +54,8 @@ const VideoFeed: React.FC = () => {
         return;
       }
 
+      refreshVideos(videos.slice(currentIndex + 1, currentIndex + 51).map(video => video.video_id), token);
+
       const response = await fetch('/api/videos/recommendations', {
         headers: {
           'Authorization': `Bearer ${token}`
@@ -40,27 +66,9 @@ const VideoFeed: React.FC = () => {
         throw new Error('Failed to fetch videos');
       }
 
-      const data = await response.json();
-      const videosWithUserInfo = await Promise.all(data.map(async (video: Video) => {
-        const userResponse = await fetch(`/api/users/${video.user_id}`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-        if (userResponse.ok) {
-          const userData = await userResponse.json();
-          return {
-            ...video,
-            user: {
-              username: userData.username,
-              profile_picture_url: userData.profile_picture_url
-            }
-          };
-        }
-        return video;
-      }));
-      
-      setVideos(prev => [...prev, ...videosWithUserInfo]);
+      // Each recommendation already carries its author, current counts and like status
+      const data: Video[] = await response.json();
+      setVideos(prev => [...prev, ...data]);
       setLoading(false);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load videos');
@@ -120,6 +128,7 @@ const VideoFeed: React.FC = () => {
         isLast={currentIndex === videos.length - 1}
         onPrevious={handlePrevVideo}
         onNext={handleNextVideo}
+        onVideoChange={handleVideoChange}
       />
     </div>
   );
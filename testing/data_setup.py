@@ -2,10 +2,15 @@ import mysql.connector
 from mysql.connector import Error
 import os
 from dotenv import load_dotenv
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import URL
 
 
 load_dotenv()
 
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
 def create_database_connection():
     try:
         connection = mysql.connector.connect(
@@ -19,136 +24,47 @@ def create_database_connection():
         print(f"Error connecting to MySQL Database: {e}")
         return None
 
-def create_tables(connection):
-    cursor = connection.cursor()
-    
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id VARCHAR(255) PRIMARY KEY,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            email VARCHAR(255) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            profile_picture_url VARCHAR(255),
-            bio TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            preferences JSON,
-            is_active BOOLEAN DEFAULT true,
-            last_login TIMESTAMP
-        )
-    """)
-
-    # Videos table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS videos (
-            video_id VARCHAR(255) PRIMARY KEY,
-            user_id VARCHAR(255),
-            title VARCHAR(255) NOT NULL,
-            description TEXT,
-            video_data MEDIUMBLOB,
-            thumbnail_url VARCHAR(255),
-            category VARCHAR(50),
-            duration INT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            view_count INT DEFAULT 0,
-            like_count INT DEFAULT 0,
-            comment_count INT DEFAULT 0,
-            is_active BOOLEAN DEFAULT true,
-            moderation_status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
-            moderation_reason TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    """)
-
-    # Comments table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS comments (
-            comment_id VARCHAR(255) PRIMARY KEY,
-            video_id VARCHAR(255),
-            user_id VARCHAR(255),
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            like_count INT DEFAULT 0,
-            is_active BOOLEAN DEFAULT true,
-            moderation_status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
-            moderation_score FLOAT,
-            moderation_labels JSON,
-            moderation_reason TEXT,
-            FOREIGN KEY (video_id) REFERENCES videos(video_id),
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    """)
+def create_tables():
+    """Bring the schema up to date by running the migrations in backend/migrations."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    url = URL.create(
+        "mysql+mysqlconnector",
+        username=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME')
+    )
+    config.set_main_option("sqlalchemy.url", url.render_as_string(hide_password=False).replace("%", "%%"))
+    command.upgrade(config, "head")
 
-    # Likes table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS likes (
-            like_id VARCHAR(255) PRIMARY KEY,
-            user_id VARCHAR(255),
-            video_id VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (video_id) REFERENCES videos(video_id),
-            UNIQUE KEY unique_like (user_id, video_id)
-        )
-    """)
-
-    # User Video Interactions table
+def backfill_video_categories(connection):
+    """Split existing videos.category strings into video_categories rows."""
+    cursor = connection.cursor()
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_video_interactions (
-            interaction_id VARCHAR(255) PRIMARY KEY,
-            user_id VARCHAR(255),
-            video_id VARCHAR(255),
-            interaction_type ENUM('view', 'like', 'comment', 'share'),
-            interaction_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            watch_duration INT,
-            FOREIGN KEY (user_id) REFERENCES users(user_id),
-            FOREIGN KEY (video_id) REFERENCES videos(video_id)
-        )
+        SELECT v.video_id, v.category FROM videos v
+        WHERE v.category IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM video_categories vc WHERE vc.video_id = v.video_id)
     """)
-
-    # # Video Recommendations table
-    # cursor.execute("""
-    #     CREATE TABLE IF NOT EXISTS video_recommendations (
-    #         recommendation_id VARCHAR(255) PRIMARY KEY,
-    #         user_id VARCHAR(255),
-    #         video_id VARCHAR(255),
-    #         recommendation_score FLOAT,
-    #         generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    #         is_shown BOOLEAN DEFAULT false,
-    #         is_clicked BOOLEAN DEFAULT false,
-    #         FOREIGN KEY (user_id) REFERENCES users(user_id),
-    #         FOREIGN KEY (video_id) REFERENCES videos(video_id)
-    #     )
-    # """)
-
-    # Moderation History table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS moderation_history (
-            history_id VARCHAR(255) PRIMARY KEY,
-            content_type ENUM('video', 'comment'),
-            content_id VARCHAR(255),
-            moderation_action ENUM('flag', 'approve', 'reject', 'restore'),
-            action_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            moderation_reason TEXT,
-            automated BOOLEAN DEFAULT true
+    rows = []
+    for video_id, category in cursor.fetchall():
+        names = category.split(',')
+        # A value that filled the old VARCHAR(50) ends in a cut-off category
+        if len(category) >= 50 and len(names) > 1:
+            names = names[:-1]
+        rows.extend(
+            (video_id, name.strip())
+            for name in dict.fromkeys(names)
+            if name.strip() and name.strip() != 'None'
         )
-    """)
-
-    # Create indexes
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_category ON videos(category)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_created_at ON videos(created_at)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_interactions_user_id ON user_video_interactions(user_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_interactions_video_id ON user_video_interactions(video_id)")
-    #cursor.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_user_id ON video_recommendations(user_id)")
-
+    cursor.executemany("INSERT IGNORE INTO video_categories (video_id, category) VALUES (%s, %s)", rows)
     connection.commit()
     cursor.close()
 
 def main():
     connection = create_database_connection()
     if connection is not None:
-        create_tables(connection)
+        create_tables()
+        backfill_video_categories(connection)
         print("Database tables created successfully!")
         connection.close()
     else:
@@ -11,11 +11,17 @@ from google.ai.generativelanguage_v1beta.types import content
 import random
 import subprocess
 import tempfile
+import urllib.request
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "../.env"))
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+MODERATION_EVENTS_URL = os.getenv(
+    "MODERATION_EVENTS_URL",
+    f"http://127.0.0.1:{os.getenv('MODERATION_EVENTS_PORT', '5177')}/events"
+)
+
 TEST_USERS = [
     {"username": "influencer_vibes", "email": "influencer@test.com"},
     {"username": "trending_now", "email": "trending@test.com"},
@@ -149,6 +155,18 @@ Pets & Animals"""
     except json.JSONDecodeError:
         return [cat.strip() for cat in response.text.split('\n') if cat.strip()]
 
+def notify_pending_video(video_id):
+    try:
+        request = urllib.request.Request(
+            MODERATION_EVENTS_URL,
+            data=json.dumps({"items": [{"type": "video", "id": video_id}]}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        urllib.request.urlopen(request, timeout=2).close()
+    except Exception as e:
+        print(f"Could not notify moderation worker (video will be picked up by the next sweep): {e}")
+
 def save_video_to_database(connection, video_path, categories, user_ids):
     try:
         connection = ensure_connection(connection)
@@ -174,11 +192,19 @@ def save_video_to_database(connection, video_path, categories, user_ids):
         
         title = os.path.splitext(os.path.basename(video_path))[0]
         
+        categories = [category for category in dict.fromkeys(categories) if category and category != 'None']
         categories_str = ', '.join(categories)
         
         cursor.execute(video_insert_query, (video_id, user_id, title, video_data, categories_str))
+        # One row per category so lookups don't depend on the joined string
+        cursor.executemany(
+            "INSERT INTO video_categories (video_id, category) VALUES (%s, %s)",
+            [(video_id, category) for category in categories]
+        )
         connection.commit()
         
+        notify_pending_video(video_id)
+        
         cursor.execute("SELECT username FROM users WHERE user_id = %s", (user_id,))
         username = cursor.fetchone()[0]
         